@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        import api.signals  # noqa: F401
+        from django.db.backends.signals import connection_created
+
+        from api.caches import check_shared_cache
+        from api.metrics import install_query_recorder, instrument_serializers
+
+        check_shared_cache()
+        connection_created.connect(install_query_recorder)
+        instrument_serializers()
@@ -0,0 +1,100 @@
+import hashlib
+import time
+from collections import OrderedDict
+from functools import partial
+from threading import Lock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from rest_framework.authentication import TokenAuthentication
+
+from api.caches import is_process_local_cache
+
+TOKEN_CACHE_TIMEOUT = 60
+TOKEN_LOCAL_CACHE_TIMEOUT = 5
+TOKEN_LOCAL_CACHE_SIZE = 1024
+
+
+class TokenCache:
+    '''Кэш токен -> (id пользователя, is_active): LRU процесса перед
+    кэшем Django.
+
+    Отзыв токена удаляет записи в общем кэше и в LRU текущего процесса,
+    остальные процессы узнают о нём, когда истечёт их локальная запись,
+    то есть за несколько секунд. Если кэш Django сам живёт в процессе,
+    его записи хранятся не дольше локальных. Сам пользователь
+    с хэшем пароля в кэш не попадает.
+    '''
+
+    def __init__(self, maxsize=TOKEN_LOCAL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._local = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def get_cache_key(key):
+        return 'auth_token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._local.move_to_end(key)
+                    return entry[1]
+                del self._local[key]
+        value = cache.get(self.get_cache_key(key))
+        if value is not None:
+            self.set_local(key, value)
+        return value
+
+    def set(self, key, user):
+        value = (user.pk, user.is_active)
+        timeout = (TOKEN_LOCAL_CACHE_TIMEOUT if is_process_local_cache()
+                   else TOKEN_CACHE_TIMEOUT)
+        cache.set(self.get_cache_key(key), value, timeout)
+        self.set_local(key, value)
+
+    def set_local(self, key, value):
+        with self._lock:
+            self._local[key] = (
+                time.monotonic() + TOKEN_LOCAL_CACHE_TIMEOUT, value)
+            self._local.move_to_end(key)
+            if len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def invalidate(self, *keys):
+        cache.delete_many([self.get_cache_key(key) for key in keys])
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+
+token_cache = TokenCache()
+
+
+class TokenUser(SimpleLazyObject):
+    '''Пользователь тёплого токена.
+
+    id и признаки аутентификации известны из кэша, остальные поля
+    читаются из базы одним запросом при первом обращении.
+    '''
+
+    def __init__(self, pk):
+        super().__init__(partial(get_user_model().objects.get, pk=pk))
+        self.__dict__.update(pk=pk, id=pk, is_active=True,
+                             is_authenticated=True, is_anonymous=False)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''Аутентификация по токену без запроса к базе для тёплых токенов'''
+
+    def authenticate_credentials(self, key):
+        value = token_cache.get(key)
+        if value is None or not value[1]:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user)
+            return user, token
+        return TokenUser(value[0]), self.get_model()(key=key,
+                                                     user_id=value[0])
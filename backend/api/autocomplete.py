@@ -0,0 +1,104 @@
+from array import array
+from bisect import bisect_left
+from threading import Lock
+
+from django.db import connection
+
+from api.caches import ingredient_cache
+from recipes.models import Ingredient
+
+AUTOCOMPLETE_LIMIT = 20
+AUTOCOMPLETE_MAX_LIMIT = 100
+MIN_SUBSTRING_LENGTH = 3
+
+
+def trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class DatabaseAutocomplete:
+    '''Поиск ингредиентов по индексам PostgreSQL.
+
+    Префиксный поиск идёт по индексу UPPER(name) text_pattern_ops,
+    поиск подстроки - по триграммному GIN индексу pg_trgm.
+    '''
+
+    def search(self, query, limit):
+        results = list(Ingredient.objects.filter(
+            name__istartswith=query).order_by('name')[:limit])
+        if len(results) < limit and len(query) >= MIN_SUBSTRING_LENGTH:
+            results += Ingredient.objects.filter(
+                name__icontains=query).exclude(
+                name__istartswith=query).order_by(
+                'name')[:limit - len(results)]
+        return results
+
+
+class InMemoryAutocomplete:
+    '''Поиск ингредиентов по отсортированному массиву в памяти процесса.
+
+    Используется вместо индексов PostgreSQL, например на SQLite в тестах.
+    Массив перестраивается при смене версии кэша ингредиентов.
+    '''
+
+    def __init__(self):
+        self._lock = Lock()
+        self._index = None
+
+    def build(self):
+        rows = sorted(
+            (name.casefold(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit').iterator())
+        keys = [row[0] for row in rows]
+        postings = {}
+        for position, key in enumerate(keys):
+            for trigram in trigrams(key):
+                postings.setdefault(trigram, array('I')).append(position)
+        return keys, rows, postings
+
+    def get_index(self):
+        version = ingredient_cache.get_version()
+        index = self._index
+        if index is None or index[0] != version:
+            with self._lock:
+                if self._index is None or self._index[0] != version:
+                    self._index = (version, *self.build())
+                index = self._index
+        return index[1:]
+
+    def search(self, query, limit):
+        keys, rows, postings = self.get_index()
+        query = query.casefold()
+        positions = []
+        start = bisect_left(keys, query)
+        for position in range(start, len(keys)):
+            if len(positions) == limit or not keys[position].startswith(query):
+                break
+            positions.append(position)
+        if len(positions) < limit and len(query) >= MIN_SUBSTRING_LENGTH:
+            # позиции в списках возрастают, кандидаты из самого короткого
+            # проверяются по порядку до набора limit совпадений
+            candidates = min(
+                (postings.get(trigram, ()) for trigram in trigrams(query)),
+                key=len)
+            for position in candidates:
+                if len(positions) == limit:
+                    break
+                key = keys[position]
+                if query in key and not key.startswith(query):
+                    positions.append(position)
+        return [
+            Ingredient(pk=rows[position][1], name=rows[position][2],
+                       measurement_unit=rows[position][3])
+            for position in positions]
+
+
+database_autocomplete = DatabaseAutocomplete()
+in_memory_autocomplete = InMemoryAutocomplete()
+
+
+def get_autocomplete():
+    if connection.vendor == 'postgresql':
+        return database_autocomplete
+    return in_memory_autocomplete
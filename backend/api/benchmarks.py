@@ -0,0 +1,361 @@
+import json
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+from statistics import mean, quantiles
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_databases, teardown_databases)
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.caches import ingredient_cache, recipe_feed_cache, tag_cache
+from recipes.models import (Favourite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+
+BENCHMARK_PREFIX = 'bench'
+BENCHMARK_PASSWORD = 'bench-password'
+BENCHMARK_IMAGE = 'recipes/bench.png'
+INGREDIENTS_PER_RECIPE = 8
+TAGS_PER_RECIPE = 2
+TAG_COUNT = 8
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmarks',
+    }
+}
+
+
+@contextmanager
+def isolated_environment(keepdb=False):
+    '''Отдельная тестовая база, временный MEDIA_ROOT и свой кэш.
+
+    Данные и файлы нагрузочного теста не попадают в рабочую базу
+    и хранилище, а очистка кэша не задевает кэш приложения.
+    '''
+
+    media_root = tempfile.mkdtemp(prefix='foodgram-benchmarks-')
+    try:
+        with override_settings(MEDIA_ROOT=media_root,
+                               CACHES=BENCHMARK_CACHES):
+            old_config = setup_databases(verbosity=0, interactive=False,
+                                         keepdb=keepdb)
+            try:
+                yield
+            finally:
+                teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+def has_data():
+    return Recipe.objects.filter(
+        author__username__startswith=BENCHMARK_PREFIX).exists()
+
+
+def make_image(size=(64, 64)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def bulk(model, objects, batch_size):
+    model.objects.bulk_create(objects, batch_size=batch_size,
+                              ignore_conflicts=True)
+
+
+def generate_data(users, recipes, ingredients, follows, favorites, carts,
+                  seed=0, batch_size=5000):
+    '''Наполняет базу синтетическими данными заданного масштаба.
+
+    follows, favorites и carts - среднее число записей на пользователя.
+    Записи создаются пакетами без сигналов, счётчики и рейтинг
+    пересчитываются после загрузки.
+    '''
+
+    rng = random.Random(seed)
+    password = make_password(BENCHMARK_PASSWORD)
+    bulk(User, [
+        User(email=f'{BENCHMARK_PREFIX}{i}@example.com',
+             username=f'{BENCHMARK_PREFIX}{i}', first_name='Bench',
+             last_name=str(i), password=password)
+        for i in range(users)], batch_size)
+    user_ids = list(User.objects.filter(
+        username__startswith=BENCHMARK_PREFIX).values_list('pk', flat=True))
+    bulk(Tag, [
+        Tag(name=f'{BENCHMARK_PREFIX} tag {i}', color=f'#{i:06x}',
+            slug=f'{BENCHMARK_PREFIX}-{i}')
+        for i in range(TAG_COUNT)], batch_size)
+    tag_ids = list(Tag.objects.filter(
+        slug__startswith=BENCHMARK_PREFIX).values_list('pk', flat=True))
+    bulk(Ingredient, [
+        Ingredient(name=f'{BENCHMARK_PREFIX} ингредиент {i:07d}',
+                   measurement_unit=rng.choice(('г', 'мл', 'шт.')))
+        for i in range(ingredients)], batch_size)
+    ingredient_ids = list(Ingredient.objects.filter(
+        name__startswith=BENCHMARK_PREFIX).values_list('pk', flat=True))
+    if not default_storage.exists(BENCHMARK_IMAGE):
+        default_storage.save(BENCHMARK_IMAGE, ContentFile(make_image()))
+    last_pk = Recipe.objects.order_by('-pk').values_list(
+        'pk', flat=True).first() or 0
+    bulk(Recipe, [
+        Recipe(author_id=rng.choice(user_ids),
+               name=f'{BENCHMARK_PREFIX} рецепт {i}',
+               text='Описание рецепта для нагрузочного теста.',
+               cooking_time=rng.randint(5, 120), image=BENCHMARK_IMAGE)
+        for i in range(recipes)], batch_size)
+    recipe_ids = list(Recipe.objects.filter(pk__gt=last_pk).values_list(
+        'pk', flat=True))
+    bulk(Recipe.tags.through, [
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in rng.sample(tag_ids, TAGS_PER_RECIPE)], batch_size)
+    bulk(RecipeIngredients, [
+        RecipeIngredients(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                          amount=rng.randint(1, 500))
+        for recipe_id in recipe_ids
+        for ingredient_id in rng.sample(
+            ingredient_ids, min(INGREDIENTS_PER_RECIPE, len(ingredient_ids)))
+    ], batch_size)
+    bulk(Follow, [
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in rng.sample(user_ids, min(follows, len(user_ids)))
+        if author_id != user_id], batch_size)
+    for model, per_user in ((Favourite, favorites), (ShoppingCart, carts)):
+        bulk(model, [
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in rng.sample(
+                recipe_ids, min(per_user, len(recipe_ids)))], batch_size)
+    tag_cache.invalidate()
+    ingredient_cache.invalidate()
+    recipe_feed_cache.invalidate()
+    cache.clear()
+
+
+class Scenario:
+    '''Сценарий запроса к API'''
+
+    def __init__(self, name, method, build, authenticated=True):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.authenticated = authenticated
+
+
+def get_fixtures(seed=0):
+    rng = random.Random(seed)
+    recipe = Recipe.objects.filter(
+        author__username__startswith=BENCHMARK_PREFIX).select_related(
+        'author').order_by('-pk').first()
+    if recipe is None:
+        raise LookupError('Нет рецептов для нагрузочного теста.')
+    user = recipe.author
+    token, _ = Token.objects.get_or_create(user=user)
+    recipe_ids = list(Recipe.objects.order_by('-pk').values_list(
+        'pk', flat=True)[:1000])
+    slugs = list(Tag.objects.values_list('slug', flat=True))
+    ingredient_ids = list(Ingredient.objects.values_list(
+        'pk', flat=True)[:1000])
+    names = list(Ingredient.objects.values_list('name', flat=True)[:1000])
+    if not ShoppingCart.objects.filter(user=user).exists():
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe_id=pk) for pk in recipe_ids[:10])
+    image = 'data:image/png;base64,' + b64encode(make_image()).decode()
+    return {'rng': rng, 'user': user, 'token': token.key,
+            'recipe_ids': recipe_ids, 'slugs': slugs,
+            'ingredient_ids': ingredient_ids, 'names': names,
+            'own': recipe.pk, 'image': image}
+
+
+def recipe_body(fixtures):
+    rng = fixtures['rng']
+    ingredient_ids = rng.sample(
+        fixtures['ingredient_ids'],
+        min(INGREDIENTS_PER_RECIPE, len(fixtures['ingredient_ids'])))
+    return {
+        'ingredients': [{'id': pk, 'amount': rng.randint(1, 500)}
+                        for pk in ingredient_ids],
+        'tags': list(Tag.objects.values_list('pk', flat=True)[:2]),
+        'image': fixtures['image'],
+        'name': 'Рецепт из нагрузочного теста',
+        'text': 'Описание',
+        'cooking_time': rng.randint(5, 120),
+    }
+
+
+SCENARIOS = (
+    Scenario('feed', 'get', lambda f: '/api/recipes/'),
+    Scenario('feed_anonymous', 'get', lambda f: '/api/recipes/',
+             authenticated=False),
+    Scenario('feed_large_page', 'get', lambda f: '/api/recipes/?limit=50'),
+    Scenario('feed_cursor', 'get', lambda f: '/api/recipes/?cursor='),
+    Scenario('feed_filtered', 'get', lambda f: (
+        '/api/recipes/?is_favorited=1&' + '&'.join(
+            f'tags={slug}' for slug in f['slugs'][:3]))),
+    Scenario('feed_author', 'get', lambda f: (
+        f'/api/recipes/?author={f["user"].pk}')),
+    Scenario('feed_popular', 'get',
+             lambda f: '/api/recipes/?ordering=popular'),
+    Scenario('feed_search', 'get',
+             lambda f: '/api/recipes/?search=0000042'),
+    Scenario('recipe_detail', 'get', lambda f: (
+        f'/api/recipes/{f["rng"].choice(f["recipe_ids"])}/')),
+    Scenario('subscriptions', 'get',
+             lambda f: '/api/users/subscriptions/?recipes_limit=3'),
+    Scenario('ingredient_search', 'get', lambda f: (
+        '/api/ingredients/?name='
+        + f['rng'].choice(f['names'])[:f['rng'].randint(1, 12)])),
+    Scenario('ingredient_substring', 'get', lambda f: (
+        '/api/ingredients/?name='
+        + f['rng'].choice(f['names'])[-f['rng'].randint(3, 7):])),
+    Scenario('cart_download_txt', 'get', lambda f: (
+        '/api/recipes/download_shopping_cart/?output=txt')),
+    Scenario('cart_download_pdf', 'get', lambda f: (
+        '/api/recipes/download_shopping_cart/?output=pdf')),
+    Scenario('recipe_create', 'post',
+             lambda f: ('/api/recipes/', recipe_body(f))),
+    Scenario('recipe_update', 'patch', lambda f: (
+        f'/api/recipes/{f["own"]}/', recipe_body(f))),
+)
+
+
+def get_client(fixtures, authenticated):
+    client = APIClient()
+    if authenticated:
+        client.credentials(HTTP_AUTHORIZATION=f'Token {fixtures["token"]}')
+    return client
+
+
+def send(client, scenario, fixtures):
+    request = scenario.build(fixtures)
+    path, data = request if isinstance(request, tuple) else (request, None)
+    response = getattr(client, scenario.method)(path, data, format='json')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response.status_code
+
+
+def measure(scenario, fixtures, requests, concurrency, cold=False):
+    '''Задержки, пропускная способность и число SQL-запросов сценария'''
+
+    client = get_client(fixtures, scenario.authenticated)
+    send(client, scenario, fixtures)
+    with CaptureQueriesContext(connection) as queries:
+        send(client, scenario, fixtures)
+    query_count = len(queries.captured_queries)
+
+    def worker(count):
+        close_old_connections()
+        thread_client = get_client(fixtures, scenario.authenticated)
+        timings, statuses = [], set()
+        for _ in range(count):
+            if cold:
+                cache.clear()
+            started = time.perf_counter()
+            statuses.add(send(thread_client, scenario, fixtures))
+            timings.append(time.perf_counter() - started)
+        close_old_connections()
+        return timings, statuses
+
+    shares = [requests // concurrency + (i < requests % concurrency)
+              for i in range(concurrency)]
+    started = time.perf_counter()
+    if concurrency == 1:
+        results = [worker(requests)]
+    else:
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(worker, shares))
+    elapsed = time.perf_counter() - started
+    timings = sorted(t for result in results for t in result[0])
+    statuses = set().union(*(result[1] for result in results))
+    percentiles = quantiles(timings, n=100) if len(timings) > 1 else (
+        timings * 99)
+    return {
+        'requests': len(timings),
+        'mean_ms': round(mean(timings) * 1000, 3),
+        'p50_ms': round(percentiles[49] * 1000, 3),
+        'p95_ms': round(percentiles[94] * 1000, 3),
+        'p99_ms': round(percentiles[98] * 1000, 3),
+        'rps': round(len(timings) / elapsed, 1),
+        'queries': query_count,
+        'statuses': sorted(statuses),
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'), capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_scale():
+    return {model.__name__: model.objects.count()
+            for model in (User, Recipe, Ingredient, Follow, Favourite,
+                          ShoppingCart)}
+
+
+def run_benchmarks(names=None, requests=100, concurrency=1, cold=False,
+                   seed=0):
+    fixtures = get_fixtures(seed)
+    results = {}
+    for scenario in SCENARIOS:
+        if names and scenario.name not in names:
+            continue
+        results[scenario.name] = measure(
+            scenario, fixtures, requests, concurrency, cold)
+    return {
+        'meta': {
+            'commit': get_commit(),
+            'created': timezone.now().isoformat(),
+            'vendor': connection.vendor,
+            'requests': requests,
+            'concurrency': concurrency,
+            'cold': cold,
+            'scale': get_scale(),
+        },
+        'endpoints': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    '''Строки сравнения с прошлым прогоном и список регрессий'''
+
+    lines, regressions = [], []
+    for name, result in current['endpoints'].items():
+        previous = baseline['endpoints'].get(name)
+        if previous is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'queries'):
+            before, after = previous[metric], result[metric]
+            change = (after - before) / before * 100 if before else 0.0
+            line = f'{name}.{metric}: {before} -> {after} ({change:+.1f}%)'
+            lines.append(line)
+            if metric == 'queries' and after > before or (
+                    metric == 'p50_ms' and change > threshold):
+                regressions.append(line)
+    return lines, regressions
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
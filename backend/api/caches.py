@@ -0,0 +1,88 @@
+import hashlib
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+REFERENCE_CACHE_SIZE = 256
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_process_local_cache():
+    return settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES
+
+
+def check_shared_cache():
+    '''Версии списков покупок, токены и данные рецептов сбрасываются
+    через кэш Django, поэтому нескольким процессам нужен общий кэш'''
+
+    if is_process_local_cache() and (settings.GUNICORN_WORKERS > 1
+                                     or settings.BACKGROUND_JOBS):
+        raise ImproperlyConfigured(
+            'GUNICORN_WORKERS > 1 или BACKGROUND_JOBS=True требуют '
+            'общего кэша: укажите CACHE_BACKEND, например '
+            'django.core.cache.backends.memcached.PyMemcacheCache, '
+            'и CACHE_LOCATION.')
+
+
+class ReferenceCache:
+    '''Версионированный кэш справочников.
+
+    Готовые байты ответов хранятся в кэше Django и в LRU процесса перед ним.
+    Смена версии делает недоступными все прежние записи.
+    '''
+
+    def __init__(self, name, maxsize=REFERENCE_CACHE_SIZE):
+        self.name = name
+        self.maxsize = maxsize
+        self._local = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def version_key(self):
+        return f'{self.name}:version'
+
+    def get_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+        with self._lock:
+            self._local.clear()
+
+    def get_or_set(self, key, build):
+        version = self.get_version()
+        local_key = (version, key)
+        with self._lock:
+            value = self._local.get(local_key)
+            if value is not None:
+                self._local.move_to_end(local_key)
+                return value
+        digest = hashlib.md5(key.encode()).hexdigest()
+        shared_key = f'{self.name}:{version}:{digest}'
+        value = cache.get(shared_key)
+        if value is None:
+            value = build()
+            cache.set(shared_key, value, REFERENCE_CACHE_TIMEOUT)
+        with self._lock:
+            self._local[local_key] = value
+            if len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+        return value
+
+
+tag_cache = ReferenceCache('tags')
+ingredient_cache = ReferenceCache('ingredients')
+recipe_feed_cache = ReferenceCache('recipe_feed')
+recipe_search_cache = ReferenceCache('recipe_search')
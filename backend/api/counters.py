@@ -0,0 +1,145 @@
+from django.db import connections, router, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery, sql
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favourite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favourite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def change_counters(model, pks, field, delta):
+    '''Атомарное изменение счётчиков, не опускающее их ниже нуля'''
+
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_counter(model, pk, field, delta):
+    change_counters(model, (pk,), field, delta)
+
+
+def insert_ignore(model, rows):
+    '''Вставка строк одним INSERT с пропуском нарушений уникальности.
+
+    В отличие от bulk_create(ignore_conflicts=True) возвращает число
+    действительно добавленных строк.
+    '''
+
+    objs = [model(**row) for row in rows]
+    if not objs:
+        return 0
+    using = router.db_for_write(model)
+    query = sql.InsertQuery(model, ignore_conflicts=True)
+    query.insert_values([field for field in model._meta.concrete_fields
+                         if not field.primary_key], objs)
+    inserted = 0
+    with connections[using].cursor() as cursor:
+        for statement, params in query.get_compiler(using).as_sql():
+            cursor.execute(statement, params)
+            inserted += cursor.rowcount
+    return inserted
+
+
+def delete_rows(queryset):
+    '''Удаление одним DELETE без выборки строк и без сигналов'''
+
+    return queryset._raw_delete(queryset.db)
+
+
+def toggle_relation(model, add, counter=None, on_change=None, **fields):
+    '''Добавляет или удаляет связь, опираясь на уникальный индекс.
+
+    counter - (модель, pk, поле) счётчика, он меняется вместе со связью
+    и только если строка действительно добавилась или удалилась.
+    Сигналы моделей не отправляются, поэтому сброс кешей передаётся
+    в on_change и выполняется после коммита. Возвращает True,
+    если данные изменились.
+    '''
+
+    with transaction.atomic():
+        if add:
+            changed = insert_ignore(model, [fields])
+        else:
+            changed = delete_rows(model.objects.filter(**fields))
+        if changed and counter is not None:
+            change_counter(*counter, changed if add else -changed)
+        if changed and on_change is not None:
+            transaction.on_commit(on_change)
+    return bool(changed)
+
+
+def count_related(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')), 0)
+
+
+def toggle_relations(model, add, target, ids, counter_field=None,
+                     on_change=None, **fields):
+    '''Пакетная версия toggle_relation для объектов target с id из ids.
+
+    Существование объектов и наличие связей проверяются одним запросом,
+    запись - одним INSERT или DELETE, счётчики - одним UPDATE.
+    Возвращает списки изменённых, уже находившихся в нужном
+    состоянии и не найденных id.
+    '''
+
+    related = model._meta.get_field(target).related_model
+    with transaction.atomic():
+        present = dict(related.objects.filter(pk__in=ids).annotate(
+            present=Exists(model.objects.filter(
+                **fields, **{target: OuterRef('pk')}))).values_list(
+            'pk', 'present'))
+        changing = [pk for pk in ids if present.get(pk, add) != add]
+        unchanged = [pk for pk in ids if present.get(pk) == add]
+        missing = [pk for pk in ids if pk not in present]
+        if add:
+            changed = insert_ignore(model, [
+                {**fields, f'{target}_id': pk} for pk in changing])
+        else:
+            changed = delete_rows(model.objects.filter(
+                **fields, **{f'{target}_id__in': changing}))
+        if counter_field is not None and changing:
+            if changed == len(changing):
+                change_counters(related, changing, counter_field,
+                                1 if add else -1)
+            else:
+                related.objects.filter(pk__in=changing).update(
+                    **{counter_field: count_related(model, target)})
+        if changed and on_change is not None:
+            transaction.on_commit(on_change)
+    return changing, unchanged, missing
+
+
+def clear_relations(model, target, counter_field=None, on_change=None,
+                    **fields):
+    '''Удаляет все связи одним DELETE, уменьшая счётчики одним UPDATE.
+
+    Строки блокируются и удаляются по id, поэтому связь, добавленная
+    после выборки, не удаляется без уменьшения счётчика.
+    '''
+
+    related = model._meta.get_field(target).related_model
+    with transaction.atomic():
+        rows = list(model.objects.select_for_update().filter(
+            **fields).values_list('pk', f'{target}_id'))
+        deleted = delete_rows(model.objects.filter(
+            pk__in=[pk for pk, _ in rows]))
+        targets = [target_id for _, target_id in rows]
+        if counter_field is not None and targets:
+            if deleted == len(rows):
+                change_counters(related, targets, counter_field, -1)
+            else:
+                related.objects.filter(pk__in=targets).update(
+                    **{counter_field: count_related(model, target)})
+        if deleted and on_change is not None:
+            transaction.on_commit(on_change)
+    return deleted
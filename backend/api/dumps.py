@@ -0,0 +1,263 @@
+import json
+import os
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import NotSupportedError, connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from api.caches import ingredient_cache, recipe_feed_cache, tag_cache
+from api.counters import change_counters
+from api.models import ImportCheckpoint
+from api.rankings import create_rankings
+from api.search import update_search
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from users.models import User
+
+DUMP_CHUNK_SIZE = 2000
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+TAG_FIELDS = ('name', 'color', 'slug')
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def read_last_id(file):
+    '''id последнего полностью записанного рецепта в выгрузке.
+
+    Файл читается с конца блоками, оборванная последняя строка
+    отрезается, чтобы дописывать выгрузку с места остановки.
+    '''
+
+    end = file.seek(0, os.SEEK_END)
+    position = end
+    tail = b''
+    while position > 0 and tail.count(b'\n') < 2:
+        position = max(0, position - TAIL_BLOCK_SIZE)
+        file.seek(position)
+        tail = file.read(end - position)
+    complete = tail.rfind(b'\n') + 1
+    if position + complete < end:
+        file.truncate(position + complete)
+    lines = tail[:complete].splitlines()
+    return json.loads(lines[-1])['id'] if lines else 0
+
+
+def get_author_fields(with_passwords=False):
+    return AUTHOR_FIELDS + ('password',) if with_passwords else AUTHOR_FIELDS
+
+
+def serialize_chunk(recipes, author_fields=AUTHOR_FIELDS):
+    ids = [recipe['id'] for recipe in recipes]
+    tags = defaultdict(list)
+    for recipe_id, *values in Recipe.tags.through.objects.filter(
+            recipe_id__in=ids).order_by('pk').values_list(
+            'recipe_id', *(f'tag__{field}' for field in TAG_FIELDS)):
+        tags[recipe_id].append(dict(zip(TAG_FIELDS, values)))
+    ingredients = defaultdict(list)
+    for recipe_id, name, unit, amount in RecipeIngredients.objects.filter(
+            recipe_id__in=ids).order_by('pk').values_list(
+            'recipe_id', 'ingredient__name', 'ingredient__measurement_unit',
+            'amount'):
+        ingredients[recipe_id].append(
+            {'name': name, 'measurement_unit': unit, 'amount': amount})
+    for recipe in recipes:
+        yield {
+            'id': recipe['id'],
+            'author': {field: recipe[f'author__{field}']
+                       for field in author_fields},
+            'name': recipe['name'],
+            'text': recipe['text'],
+            'image': recipe['image'],
+            'cooking_time': recipe['cooking_time'],
+            'date': recipe['date'].isoformat(),
+            'tags': tags[recipe['id']],
+            'ingredients': ingredients[recipe['id']],
+        }
+
+
+def export_recipes(file, after_id=0, chunk_size=DUMP_CHUNK_SIZE,
+                   with_passwords=False):
+    '''Выгрузка рецептов в NDJSON, по строке на рецепт.
+
+    Рецепты читаются курсором по возрастанию id, теги и ингредиенты
+    догружаются двумя запросами на пачку. Автор, теги и ингредиенты
+    записываются естественными ключами, поэтому каждая строка
+    загружается независимо от остальных. Хэши паролей авторов
+    выгружаются только с with_passwords.
+    '''
+
+    author_fields = get_author_fields(with_passwords)
+    rows = Recipe.objects.filter(pk__gt=after_id).order_by('pk').values(
+        'id', 'name', 'text', 'image', 'cooking_time', 'date',
+        *(f'author__{field}' for field in author_fields)).iterator(
+        chunk_size=chunk_size)
+    exported = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return exported
+        for recipe in serialize_chunk(chunk, author_fields):
+            file.write(json.dumps(recipe, ensure_ascii=False).encode())
+            file.write(b'\n')
+        exported += len(chunk)
+
+
+def map_natural_keys(model, key_fields, objects):
+    '''Создаёт недостающие объекты и возвращает {естественный ключ: id}'''
+
+    model.objects.bulk_create(
+        [model(**values) for values in objects.values()],
+        ignore_conflicts=True)
+    first = key_fields[0]
+    ids = {
+        tuple(values): pk for *values, pk in model.objects.filter(**{
+            f'{first}__in': {key[0] for key in objects}}).values_list(
+            *key_fields, 'pk')}
+    missing = [key for key in objects if key not in ids]
+    if missing:
+        raise ValueError(
+            f'{model._meta.verbose_name_plural}: не удалось сопоставить '
+            f'{", ".join(map(str, missing[:10]))} - конфликт с '
+            f'существующими записями.')
+    return ids
+
+
+def lock_recipe_inserts():
+    '''Запрещает вставку рецептов другим транзакциям до конца текущей.
+
+    SQLite допускает одну пишущую транзакцию на базу, поэтому
+    достаточно начать запись, остальные базы блокируют таблицу.
+    '''
+
+    table = connection.ops.quote_name(Recipe._meta.db_table)
+    if connection.vendor == 'mysql':
+        raise NotSupportedError(
+            'Загрузка рецептов на MySQL не поддерживается.')
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'UPDATE {table} SET id = id WHERE 0')
+        else:
+            cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+
+
+def create_recipes(rows, authors):
+    '''bulk_create рецептов с сохранением дат и новыми id.
+
+    Поле date заполняется при вставке текущим временем,
+    поэтому даты из выгрузки проставляются отдельным UPDATE.
+    Без RETURNING новые id берутся диапазоном после последнего,
+    на время вставки таблица рецептов блокируется.
+    '''
+
+    recipes = [
+        Recipe(author_id=authors[(row['author']['email'],)],
+               name=row['name'], text=row['text'], image=row['image'],
+               cooking_time=row['cooking_time'])
+        for row in rows]
+    returns_rows = connection.features.can_return_rows_from_bulk_insert
+    if not returns_rows:
+        lock_recipe_inserts()
+    last_pk = Recipe.objects.order_by('-pk').values_list(
+        'pk', flat=True).first() or 0
+    Recipe.objects.bulk_create(recipes)
+    if not returns_rows:
+        pks = Recipe.objects.filter(pk__gt=last_pk).order_by(
+            'pk').values_list('pk', flat=True)
+        for recipe, pk in zip(recipes, pks):
+            recipe.pk = pk
+    for recipe, row in zip(recipes, rows):
+        recipe.date = parse_datetime(row['date'])
+    Recipe.objects.bulk_update(recipes, ('date',))
+    return recipes
+
+
+def get_author(author, with_passwords=False):
+    '''Поля нового автора, без with_passwords - с непригодным паролем'''
+
+    values = {field: author[field] for field in AUTHOR_FIELDS}
+    values['password'] = (
+        author['password'] if with_passwords and author.get('password')
+        else make_password(None))
+    return values
+
+
+@transaction.atomic
+def import_batch(rows, with_passwords=False):
+    '''Загрузка пачки строк выгрузки одной транзакцией'''
+
+    authors = map_natural_keys(User, ('email',), {
+        (row['author']['email'],): get_author(row['author'], with_passwords)
+        for row in rows})
+    tags = map_natural_keys(Tag, ('slug',), {
+        (tag['slug'],): tag for row in rows for tag in row['tags']})
+    ingredients = map_natural_keys(Ingredient, ('name', 'measurement_unit'), {
+        (ingredient['name'], ingredient['measurement_unit']): {
+            'name': ingredient['name'],
+            'measurement_unit': ingredient['measurement_unit']}
+        for row in rows for ingredient in row['ingredients']})
+    recipes = create_recipes(rows, authors)
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe_id=recipe.pk,
+                            tag_id=tags[(tag['slug'],)])
+        for recipe, row in zip(recipes, rows) for tag in row['tags']],
+        ignore_conflicts=True)
+    RecipeIngredients.objects.bulk_create([
+        RecipeIngredients(
+            recipe_id=recipe.pk,
+            ingredient_id=ingredients[(ingredient['name'],
+                                       ingredient['measurement_unit'])],
+            amount=ingredient['amount'])
+        for recipe, row in zip(recipes, rows)
+        for ingredient in row['ingredients']])
+    by_delta = defaultdict(list)
+    for author_id, count in Counter(
+            recipe.author_id for recipe in recipes).items():
+        by_delta[count].append(author_id)
+    for count, author_ids in by_delta.items():
+        change_counters(User, author_ids, 'recipes_count', count)
+    create_rankings(recipe.pk for recipe in recipes)
+    update_search(recipe.pk for recipe in recipes)
+    return {row['id']: recipe.pk for recipe, row in zip(recipes, rows)}
+
+
+def get_import_offset(checkpoint):
+    return ImportCheckpoint.objects.filter(name=checkpoint).values_list(
+        'offset', flat=True).first() or 0
+
+
+def save_import_offset(checkpoint, offset):
+    ImportCheckpoint.objects.update_or_create(
+        name=checkpoint, defaults={'offset': offset})
+
+
+def import_recipes(file, offset=0, batch_size=DUMP_CHUNK_SIZE,
+                   on_batch=None, with_passwords=False, checkpoint=None):
+    '''Загрузка выгрузки export_recipes пачками по batch_size строк.
+
+    Смещение, с которого продолжится загрузка, сохраняется
+    в отметке checkpoint той же транзакцией, что и пачка, поэтому
+    после сбоя пачки не загружаются повторно. После каждой пачки
+    в on_batch передаётся смещение и соответствие старых id рецептов
+    новым. Новые авторы получают пароли из выгрузки только
+    с with_passwords. Возвращает число загруженных рецептов.
+    '''
+
+    file.seek(offset)
+    imported = 0
+    while True:
+        lines = list(islice(file, batch_size))
+        if not lines:
+            break
+        rows = [json.loads(line) for line in lines if line.strip()]
+        offset += sum(map(len, lines))
+        with transaction.atomic():
+            remapped = import_batch(rows, with_passwords) if rows else {}
+            if checkpoint is not None:
+                save_import_offset(checkpoint, offset)
+        imported += len(rows)
+        if on_batch is not None:
+            on_batch(offset, remapped)
+    tag_cache.invalidate()
+    ingredient_cache.invalidate()
+    recipe_feed_cache.invalidate()
+    return imported
@@ -0,0 +1,69 @@
+import base64
+import uuid
+
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image
+from rest_framework import serializers
+
+from api.images import get_image_url
+
+BASE64_CHUNK_SIZE = 64 * 1024
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+class Base64ImageField(serializers.ImageField):
+    '''Картинка в base64.
+
+    Данные декодируются частями во временный файл на диске, формат
+    и размеры определяются по заголовку, а целостность проверяется
+    Image.verify() без декодирования всей картинки.
+    '''
+
+    default_error_messages = {
+        'invalid_image': 'Загрузите корректную картинку.',
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid_image')
+        content_type, _, data = data.rpartition(';base64,')
+        file = TemporaryUploadedFile(
+            'image', content_type.replace('data:', '') or None, 0, None)
+        try:
+            for start in range(0, len(data), BASE64_CHUNK_SIZE):
+                file.write(base64.b64decode(
+                    data[start:start + BASE64_CHUNK_SIZE], validate=True))
+            file.size = file.tell()
+            file.seek(0)
+            image = Image.open(file)
+            image.verify()
+        except Exception:
+            file.close()
+            self.fail('invalid_image')
+        width, height = image.size
+        if (image.format not in IMAGE_FORMATS
+                or width * height > Image.MAX_IMAGE_PIXELS):
+            file.close()
+            self.fail('invalid_image')
+        file.seek(0)
+        file.name = f'{uuid.uuid4()}.{IMAGE_FORMATS[image.format]}'
+        return file
+
+
+class ThumbnailField(serializers.ImageField):
+    '''Адрес уменьшенной копии картинки нужного размера'''
+
+    def __init__(self, size, **kwargs):
+        self.size = size
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = get_image_url(value, self.context.get('thumbnail_size',
+                                                    self.size))
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
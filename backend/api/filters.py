@@ -1,33 +1,61 @@
-from django.contrib.auth import get_user_model
+from django import forms
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework
-from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe
+from api.caches import tag_cache
+from api.search import get_search
+from recipes.models import Favourite, Recipe, ShoppingCart, Tag
 
-User = get_user_model()
 
+def get_tag_ids_by_slug():
+    return tag_cache.get_or_set(
+        'slug_map', lambda: dict(Tag.objects.values_list('slug', 'id')))
 
-class NameSearchFilter(SearchFilter):
-    search_param = 'name'
+
+class SlugsField(forms.MultipleChoiceField):
+    '''Список слагов без проверки по вариантам из базы'''
+
+    def valid_value(self, value):
+        return True
+
+
+class SlugsFilter(rest_framework.MultipleChoiceFilter):
+    field_class = SlugsField
 
 
 class RecipeFilter(rest_framework.FilterSet):
-    author = rest_framework.ModelChoiceFilter(queryset=User.objects.all())
-    tags = rest_framework.AllValuesMultipleFilter(field_name='tags__slug')
+    author = rest_framework.NumberFilter(field_name='author')
+    tags = SlugsFilter(method='filter_tags')
     is_favorited = rest_framework.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = rest_framework.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = rest_framework.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search')
+
+    def filter_tags(self, queryset, name, value):
+        tag_ids = get_tag_ids_by_slug()
+        ids = [tag_ids[slug] for slug in value if slug in tag_ids]
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag_id__in=ids)))
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(Exists(Favourite.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk'))))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(shopping__user=self.request.user)
-        return queryset
\ No newline at end of file
+            return queryset.filter(Exists(ShoppingCart.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk'))))
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        queryset = get_search().filter(queryset, value)
+        if 'ordering' in self.request.query_params:
+            return queryset
+        return queryset.order_by('-search_rank', '-id')
@@ -0,0 +1,91 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from PIL import Image, features
+
+from api.jobs import enqueue_on_commit
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = {
+    'card': (480, 480),
+    'subscription': (160, 160),
+    'detail': (1024, 1024),
+}
+THUMBNAIL_FORMAT, THUMBNAIL_EXTENSION = (
+    ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg'))
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_DIR = 'recipes/thumbnails'
+
+thumbnails_generated = Signal()
+
+executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS,
+                              thread_name_prefix='thumbnails')
+
+
+def get_thumbnail_name(name, size):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{THUMBNAIL_DIR}/{size}/{stem}.{THUMBNAIL_EXTENSION}'
+
+
+def get_image_url(image, size):
+    '''Адрес уменьшенной копии, пока её нет - адрес оригинала'''
+
+    thumbnail_name = get_thumbnail_name(image.name, size)
+    if default_storage.exists(thumbnail_name):
+        return default_storage.url(thumbnail_name)
+    return image.url
+
+
+def generate_thumbnails(name):
+    '''Создание уменьшенных копий картинки всех размеров'''
+
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    if THUMBNAIL_FORMAT == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    for size, box in THUMBNAIL_SIZES.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail(box)
+        buffer = BytesIO()
+        thumbnail.save(buffer, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+        thumbnail_name = get_thumbnail_name(name, size)
+        default_storage.delete(thumbnail_name)
+        default_storage.save(thumbnail_name, ContentFile(buffer.getvalue()))
+    thumbnails_generated.send(sender=None, name=name)
+
+
+def run_generate_thumbnails(name):
+    '''Задача пула: соединения потока с базой закрываются по правилам
+    запроса, как в обработчике HTTP'''
+
+    close_old_connections()
+    try:
+        generate_thumbnails(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    finally:
+        close_old_connections()
+
+
+def run_thumbnails_job(job):
+    generate_thumbnails(job.payload['name'])
+
+
+def schedule_thumbnails(name):
+    '''Передаёт обработку картинки пулу или очереди задач после фиксации
+    транзакции'''
+
+    if settings.BACKGROUND_JOBS:
+        enqueue_on_commit('thumbnails', {'name': name}, key=name)
+        return
+    transaction.on_commit(
+        lambda: executor.submit(run_generate_thumbnails, name))
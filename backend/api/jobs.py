@@ -0,0 +1,115 @@
+import logging
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {
+    'shopping_cart_pdf': 'api.utils.run_cart_pdf_job',
+    'thumbnails': 'api.images.run_thumbnails_job',
+}
+JOB_MAX_ATTEMPTS = 3
+JOB_TIMEOUT = timedelta(minutes=10)
+JOB_RETRY_DELAY = timedelta(seconds=30)
+JOB_RETENTION = timedelta(days=1)
+JOB_RESULT_DIR = 'jobs'
+
+
+def enqueue(kind, payload, user=None, key=''):
+    '''Ставит задачу в очередь.
+
+    Если задача того же типа с тем же непустым ключом ещё не завершилась
+    с ошибкой, возвращается она, а новая не создаётся.
+    '''
+
+    if key:
+        job = Job.objects.filter(kind=kind, key=key).exclude(
+            status=Job.FAILED).first()
+        if job is not None:
+            return job
+    return Job.objects.create(kind=kind, key=key, user=user, payload=payload)
+
+
+def enqueue_on_commit(kind, payload, user=None, key=''):
+    transaction.on_commit(lambda: enqueue(kind, payload, user, key))
+
+
+def get_result_name(job, filename):
+    return f'{JOB_RESULT_DIR}/{job.id}/{filename}'
+
+
+def requeue_stale():
+    '''Возвращает в очередь задачи упавших воркеров'''
+
+    stale = Job.objects.filter(status=Job.RUNNING,
+                               started__lt=timezone.now() - JOB_TIMEOUT)
+    stale.filter(attempts__gte=JOB_MAX_ATTEMPTS).update(
+        status=Job.FAILED, error='Превышено время выполнения.',
+        finished=timezone.now())
+    return stale.update(status=Job.PENDING)
+
+
+def claim_next():
+    '''Забирает самую старую задачу из очереди.
+
+    Захват - условный UPDATE по статусу, поэтому несколько воркеров
+    не выполнят одну задачу дважды на любой базе.
+    '''
+
+    candidates = Job.objects.filter(
+        status=Job.PENDING, run_at__lte=timezone.now()).order_by(
+        'run_at').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING, started=timezone.now())
+        if claimed:
+            job = Job.objects.get(pk=pk)
+            job.attempts += 1
+            job.save(update_fields=('attempts',))
+            return job
+    return None
+
+
+def run_job(job):
+    try:
+        handler = import_string(JOB_HANDLERS[job.kind])
+        job.result = handler(job) or ''
+    except Exception as error:
+        logger.exception('Задача %s завершилась с ошибкой', job.pk)
+        job.error = str(error)
+        job.status = (Job.PENDING if job.attempts < JOB_MAX_ATTEMPTS
+                      else Job.FAILED)
+        job.run_at = timezone.now() + JOB_RETRY_DELAY * job.attempts
+    else:
+        job.status = Job.DONE
+    job.finished = timezone.now()
+    job.save(update_fields=('result', 'error', 'status', 'finished',
+                            'run_at'))
+    return job
+
+
+def delete_old_jobs():
+    jobs = Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED),
+        finished__lt=timezone.now() - JOB_RETENTION)
+    for name in jobs.exclude(result='').values_list('result', flat=True):
+        default_storage.delete(name)
+    return jobs.delete()[0]
+
+
+def job_accepted(job):
+    '''Ответ 202 со ссылкой на статус задачи'''
+
+    return Response(
+        {'id': job.id, 'status': job.status},
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Location': reverse('api:job-detail', args=(job.id,))})
@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import mean, quantiles
+from threading import Lock
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+POOL_ENGINE = 'foodgram.postgresql'
+MODES = {
+    'close': {'CONN_MAX_AGE': 0, 'POOL_SIZE': 0},
+    'persistent': {'CONN_MAX_AGE': 600, 'POOL_SIZE': 0},
+    'pool': {'CONN_MAX_AGE': 0},
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнение накладных расходов на соединение с базой '
+            'при параллельных запросах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на поток')
+        parser.add_argument('--modes', nargs='+', choices=MODES,
+                            default=list(MODES))
+
+    def simulate(self, requests):
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            request_started.send(sender=self.__class__)
+            with connections['default'].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            request_finished.send(sender=self.__class__)
+            timings.append(time.perf_counter() - started)
+        connections.close_all()
+        return timings
+
+    def run_mode(self, mode, threads, requests):
+        settings_dict = connections.settings['default']
+        original = dict(settings_dict)
+        settings_dict.update(MODES[mode])
+        if mode == 'pool':
+            settings_dict['POOL_SIZE'] = threads
+        created = []
+        lock = Lock()
+
+        def on_created(sender, connection, **kwargs):
+            with lock:
+                created.append(connection.alias)
+
+        connection_created.connect(on_created)
+        try:
+            with ThreadPoolExecutor(threads) as executor:
+                timings = sum(executor.map(
+                    self.simulate, [requests] * threads), [])
+        finally:
+            connection_created.disconnect(on_created)
+            settings_dict.clear()
+            settings_dict.update(original)
+        physical = len(created)
+        if mode == 'pool':
+            from foodgram.postgresql.base import close_pools, get_pool
+            physical = get_pool('default', threads).opened
+            close_pools()
+        self.stdout.write(
+            f'{mode}: {len(timings)} запросов, '
+            f'среднее {mean(timings) * 1000:.3f} мс, '
+            f'p95 {quantiles(timings, n=20)[-1] * 1000:.3f} мс, '
+            f'новых соединений {physical}')
+
+    def handle(self, *args, **options):
+        engine = connections.settings['default']['ENGINE']
+        for mode in options['modes']:
+            if mode == 'pool' and engine != POOL_ENGINE:
+                self.stdout.write(f'pool: доступен только для {POOL_ENGINE}')
+                continue
+            self.run_mode(mode, options['threads'], options['requests'])
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.dumps import DUMP_CHUNK_SIZE, export_recipes, read_last_id
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка рецептов с авторами, тегами и ингредиентами в NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=DUMP_CHUNK_SIZE)
+        parser.add_argument('--resume', action='store_true',
+                            help='Дописать файл после последнего рецепта')
+        parser.add_argument('--with-passwords', action='store_true',
+                            help='Выгрузить хэши паролей авторов')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        mode = 'ab+' if options['resume'] else 'wb'
+        with open(options['path'], mode) as file:
+            after_id = read_last_id(file) if options['resume'] else 0
+            exported = export_recipes(file, after_id, options['chunk_size'],
+                                      options['with_passwords'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено {exported} рецептов после id {after_id} '
+            f'за {elapsed:.1f} с.'))
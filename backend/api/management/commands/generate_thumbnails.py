@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.images import run_generate_thumbnails
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создание миниатюр для уже загруженных картинок рецептов'
+
+    def handle(self, *args, **options):
+        names = Recipe.objects.exclude(image='').values_list(
+            'image', flat=True)
+        count = 0
+        for name in names.iterator():
+            run_generate_thumbnails(name)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {count}.'))
@@ -1,17 +1,98 @@
+import csv
 import json
+import os
+import re
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from api.caches import ingredient_cache
 from recipes.models import Ingredient
 
+READ_CHUNK_SIZE = 64 * 1024
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_json(file):
+    '''Потоковое чтение массива объектов JSON без загрузки файла целиком'''
+
+    decoder = json.JSONDecoder()
+    number = 0
+    buffer = file.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается массив JSON.')
+    position = 1
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            row, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Файл JSON оборван.')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        number += 1
+        if (not isinstance(row, dict) or 'name' not in row
+                or 'measurement_unit' not in row):
+            raise CommandError(
+                f'Объект {number}: ожидается название '
+                f'и единица измерения.')
+        yield row['name'], row['measurement_unit']
+
+
+def read_csv(file):
+    reader = csv.reader(file)
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < 2:
+            raise CommandError(
+                f'Строка {reader.line_num}: ожидается название '
+                f'и единица измерения.')
+        yield row[0], row[1]
+
+
+READERS = {'json': read_json, 'csv': read_csv}
+
 
 class Command(BaseCommand):
+    help = 'Загрузка ингредиентов из json или csv файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='data/ingredients.json')
+        parser.add_argument('--format', choices=READERS.keys())
+        parser.add_argument('--batch-size', type=int, default=5000)
+
     def handle(self, *args, **options):
-        with open('data/ingredients.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-            for row in data:
-                ingredient = Ingredient(
-                    name=row['name'],
-                    measurement_unit=row['measurement_unit'],)
-                ingredient.save()
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        started = time.monotonic()
+        count_before = Ingredient.objects.count()
+        processed = 0
+        with open(path, 'r', encoding='utf-8') as file:
+            rows = READERS[file_format](file)
+            while True:
+                batch = [
+                    Ingredient(name=name.strip(),
+                               measurement_unit=measurement_unit.strip())
+                    for name, measurement_unit
+                    in islice(rows, options['batch_size'])]
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                processed += len(batch)
+        ingredient_cache.invalidate()
+        created = Ingredient.objects.count() - count_before
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано {processed} строк, добавлено {created} '
+            f'ингредиентов за {elapsed:.2f} с '
+            f'({processed / max(elapsed, 1e-6):.0f} строк/с).'))
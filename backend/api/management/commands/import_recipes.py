@@ -0,0 +1,56 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+
+from api.dumps import DUMP_CHUNK_SIZE, get_import_offset, import_recipes
+
+
+class Command(BaseCommand):
+    help = 'Загрузка рецептов из выгрузки export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=DUMP_CHUNK_SIZE)
+        parser.add_argument(
+            '--checkpoint',
+            help='Имя отметки в базе, по умолчанию полный путь к файлу')
+        parser.add_argument('--restart', action='store_true',
+                            help='Начать с начала файла, игнорируя отметку')
+        parser.add_argument('--id-map',
+                            help='Файл для пар "старый id - новый id"')
+        parser.add_argument('--with-passwords', action='store_true',
+                            help='Перенести хэши паролей новых авторов')
+
+    def handle(self, *args, **options):
+        checkpoint = (options['checkpoint']
+                      or os.path.abspath(options['path']))
+        offset = 0 if options['restart'] else get_import_offset(checkpoint)
+        id_map = options['id_map'] and open(
+            options['id_map'], 'a', encoding='utf-8')
+
+        def on_batch(position, remapped):
+            if id_map:
+                id_map.writelines(
+                    f'{old}\t{new}\n' for old, new in remapped.items())
+                id_map.flush()
+            self.stdout.write(f'Загружено до байта {position}.')
+
+        started = time.monotonic()
+        try:
+            with open(options['path'], 'rb') as file:
+                imported = import_recipes(file, offset,
+                                          options['batch_size'], on_batch,
+                                          options['with_passwords'],
+                                          checkpoint)
+        except (ValueError, NotSupportedError) as error:
+            raise CommandError(f'{error} Загрузка остановлена, '
+                               f'отметка: {checkpoint}.')
+        finally:
+            if id_map:
+                id_map.close()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {imported} рецептов за {elapsed:.1f} с '
+            f'({imported / max(elapsed, 1e-6):.0f} рецептов/с).'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from api.counters import COUNTERS, count_related
+
+
+class Command(BaseCommand):
+    help = 'Сверка счётчиков избранного, покупок, рецептов и подписчиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, field, related_model, related_field in COUNTERS:
+            fixed = 0
+            last_pk = 0
+            while True:
+                pks = list(model.objects.filter(pk__gt=last_pk).order_by(
+                    'pk').values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+                last_pk = pks[-1]
+                drifted = model.objects.filter(
+                    pk__gte=pks[0], pk__lte=last_pk).annotate(
+                    actual=count_related(related_model, related_field),
+                ).exclude(**{field: F('actual')}).values_list('pk', 'actual')
+                objects = [model(pk=pk, **{field: actual})
+                           for pk, actual in drifted]
+                model.objects.bulk_update(objects, (field,))
+                fixed += len(objects)
+            self.stdout.write(
+                f'{model.__name__}.{field}: исправлено {fixed}.')
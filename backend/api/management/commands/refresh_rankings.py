@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.rankings import RANKING_BATCH_SIZE, refresh_rankings
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт рейтинга популярных и набирающих популярность рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Пересобрать рейтинг с нуля')
+        parser.add_argument('--batch-size', type=int,
+                            default=RANKING_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        touched, synced = refresh_rankings(options['full'],
+                                           options['batch_size'])
+        self.stdout.write(f'Новые события: {touched} рецептов, '
+                          f'исправлена популярность: {synced}.')
@@ -0,0 +1,105 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import (SCENARIOS, compare, generate_data, has_data,
+                            isolated_environment, load_results,
+                            run_benchmarks)
+from api.images import executor as image_executor
+
+CONSTANT_QUERY_PAIRS = (('feed', 'feed_large_page'),)
+
+
+class Command(BaseCommand):
+    help = ('Замер задержек, пропускной способности и числа SQL-запросов '
+            'по эндпоинтам API на синтетических данных в тестовой базе')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Подписок на пользователя')
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Избранных рецептов на пользователя')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Рецептов в списке покупок на пользователя')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Не удалять тестовую базу с данными '
+                                 'после прогона')
+        parser.add_argument('--only', nargs='+',
+                            choices=[scenario.name for scenario in SCENARIOS])
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кэш перед каждым запросом')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output',
+                            default=os.path.join(settings.BASE_DIR,
+                                                 'benchmarks'))
+        parser.add_argument('--compare', help='Файл прошлого прогона')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Допустимый рост задержки, %%')
+
+    def generate(self, options):
+        started = time.monotonic()
+        generate_data(options['users'], options['recipes'],
+                      options['ingredients'], options['follows'],
+                      options['favorites'], options['carts'],
+                      options['seed'], options['batch_size'])
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('refresh_rankings', '--full', stdout=self.stdout)
+        call_command('update_search_index', stdout=self.stdout)
+        self.stdout.write(
+            f'Данные созданы за {time.monotonic() - started:.1f} с.')
+
+    def handle(self, *args, **options):
+        with isolated_environment(options['keepdb']):
+            if not has_data():
+                self.generate(options)
+            try:
+                results = run_benchmarks(
+                    options['only'], options['requests'],
+                    options['concurrency'], options['cold'],
+                    options['seed'])
+            except LookupError as error:
+                raise CommandError(error)
+            finally:
+                # миниатюры должны записаться во временный MEDIA_ROOT
+                image_executor.shutdown()
+        for name, result in results['endpoints'].items():
+            self.stdout.write(
+                f'{name:<20} p50 {result["p50_ms"]:>9.3f} мс  '
+                f'p95 {result["p95_ms"]:>9.3f} мс  '
+                f'p99 {result["p99_ms"]:>9.3f} мс  '
+                f'{result["rps"]:>8.1f} rps  '
+                f'SQL {result["queries"]:>3}  {result["statuses"]}')
+        endpoints = results['endpoints']
+        for first, second in CONSTANT_QUERY_PAIRS:
+            if first in endpoints and second in endpoints:
+                constant = (endpoints[first]['queries']
+                            == endpoints[second]['queries'])
+                self.stdout.write(
+                    f'Число запросов {first} и {second} '
+                    f'{"совпадает" if constant else "различается"}.')
+        os.makedirs(options['output'], exist_ok=True)
+        path = os.path.join(
+            options['output'],
+            f'{results["meta"]["created"][:19].replace(":", "-")}'
+            f'-{results["meta"]["commit"] or "local"}.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Результаты сохранены в {path}')
+        if options['compare']:
+            lines, regressions = compare(
+                results, load_results(options['compare']),
+                options['threshold'])
+            self.stdout.write('\n'.join(lines))
+            if regressions:
+                raise CommandError(
+                    'Регрессии:\n' + '\n'.join(regressions))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.jobs import claim_next, delete_old_jobs, requeue_stale, run_job
+
+MAINTENANCE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Воркер очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Пауза при пустой очереди, секунд')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить задачи из очереди и выйти')
+
+    def handle(self, *args, **options):
+        maintained_at = 0
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() - maintained_at > MAINTENANCE_INTERVAL:
+                    requeue_stale()
+                    delete_old_jobs()
+                    maintained_at = time.monotonic()
+                job = claim_next()
+                if job is not None:
+                    job = run_job(job)
+                    self.stdout.write(f'{job.kind} {job.id}: {job.status}')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.search import SEARCH_BATCH_SIZE, update_search
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересборка поисковых документов всех рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=SEARCH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.monotonic()
+        updated = 0
+        last_pk = 0
+        while True:
+            pks = list(Recipe.objects.filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            update_search(pks, batch_size)
+            updated += len(pks)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено {updated} поисковых документов за '
+            f'{time.monotonic() - started:.1f} с.'))
@@ -0,0 +1,227 @@
+import logging
+import random
+import time
+import traceback
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from django.conf import settings
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+STACK_LIMIT = 20
+DUPLICATES_LOGGED = 5
+
+current_request = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    '''Запросы к базе и время одного HTTP-запроса'''
+
+    def __init__(self, sample_stacks):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serialize_depth = 0
+        self.statements = Counter()
+        self.stacks = {}
+        self.sample_stacks = sample_stacks
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        self.statements[sql] += 1
+        if self.sample_stacks and self.statements[sql] == 2:
+            self.stacks[sql] = ''.join(
+                traceback.format_stack(limit=STACK_LIMIT)[:-3])
+
+    def duplicates(self):
+        return [(sql, count)
+                for sql, count in self.statements.most_common(
+                    DUPLICATES_LOGGED)
+                if count > 1]
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed_serialization():
+    '''Учитывает время сериализации, вложенные вызовы - один раз'''
+
+    metrics = current_request.get()
+    if metrics is None:
+        yield
+        return
+    metrics.serialize_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_depth -= 1
+        if not metrics.serialize_depth:
+            metrics.serialize_time += time.perf_counter() - started
+
+
+def timed_property(prop):
+    def getter(self):
+        with timed_serialization():
+            return prop.fget(self)
+    return property(getter)
+
+
+def instrument_serializers():
+    for serializer_class in (serializers.Serializer,
+                             serializers.ListSerializer):
+        serializer_class.data = timed_property(serializer_class.data)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+class MetricsRegistry:
+    '''Накопленные с запуска процесса метрики по представлениям'''
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        self.durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.db_time = defaultdict(float)
+        self.serialize_time = defaultdict(float)
+        self.responses = Counter()
+
+    def observe(self, view, status_code, metrics, duration):
+        with self._lock:
+            self.durations[view].observe(duration)
+            self.queries[view].observe(metrics.queries)
+            self.db_time[view] += metrics.db_time
+            self.serialize_time[view] += metrics.serialize_time
+            self.responses[view, f'{status_code // 100}xx'] += 1
+
+    def histogram_lines(self, name, histograms):
+        for view, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                yield (f'{name}_bucket{{view="{view}",le="{bound}"}} '
+                       f'{cumulative}')
+            yield (f'{name}_bucket{{view="{view}",le="+Inf"}} '
+                   f'{histogram.count}')
+            yield f'{name}_sum{{view="{view}"}} {histogram.sum}'
+            yield f'{name}_count{{view="{view}"}} {histogram.count}'
+
+    def render(self):
+        '''Метрики в текстовом формате Prometheus'''
+
+        with self._lock:
+            lines = [
+                '# HELP foodgram_request_duration_seconds Время ответа.',
+                '# TYPE foodgram_request_duration_seconds histogram',
+                *self.histogram_lines('foodgram_request_duration_seconds',
+                                      self.durations),
+                '# HELP foodgram_request_queries SQL-запросов на ответ.',
+                '# TYPE foodgram_request_queries histogram',
+                *self.histogram_lines('foodgram_request_queries',
+                                      self.queries),
+                '# HELP foodgram_request_db_seconds_total Время в базе.',
+                '# TYPE foodgram_request_db_seconds_total counter',
+                *(f'foodgram_request_db_seconds_total{{view="{view}"}} '
+                  f'{value}' for view, value in sorted(self.db_time.items())),
+                '# HELP foodgram_request_serialize_seconds_total '
+                'Время сериализации.',
+                '# TYPE foodgram_request_serialize_seconds_total counter',
+                *(f'foodgram_request_serialize_seconds_total'
+                  f'{{view="{view}"}} {value}'
+                  for view, value in sorted(self.serialize_time.items())),
+                '# HELP foodgram_responses_total Ответы по классу статуса.',
+                '# TYPE foodgram_responses_total counter',
+                *(f'foodgram_responses_total{{view="{view}",'
+                  f'status="{status}"}} {value}'
+                  for (view, status), value in sorted(
+                      self.responses.items())),
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view = match.func
+    view_class = getattr(view, 'cls', None)
+    if view_class is None:
+        return f'{view.__module__}.{view.__name__}'
+    actions = getattr(view, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+def start_request():
+    metrics = RequestMetrics(
+        random.random() < settings.QUERY_STACK_SAMPLE_RATE)
+    return metrics, current_request.set(metrics)
+
+
+def finish_request(request, response, metrics, token):
+    current_request.reset(token)
+    duration = time.perf_counter() - metrics.started
+    view = get_view_name(request)
+    registry.observe(view, response.status_code, metrics, duration)
+    if settings.SERVER_TIMING:
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={metrics.db_time * 1000:.1f};'
+            f'desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.serialize_time * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ))
+    if metrics.queries > settings.QUERY_BUDGET:
+        log_over_budget(view, metrics)
+    return response
+
+
+def log_over_budget(view, metrics):
+    lines = [f'{view}: {metrics.queries} SQL-запросов при бюджете '
+             f'{settings.QUERY_BUDGET}, {metrics.db_time * 1000:.1f} мс']
+    for sql, count in metrics.duplicates():
+        lines.append(f'{count} x {sql}')
+        if sql in metrics.stacks:
+            lines.append(metrics.stacks[sql])
+    logger.warning('\n'.join(lines))
@@ -0,0 +1,22 @@
+import asyncio
+
+from django.utils.decorators import sync_and_async_middleware
+
+from api.metrics import finish_request, start_request
+
+
+@sync_and_async_middleware
+def instrumentation_middleware(get_response):
+    '''Число и время SQL-запросов, сериализации и всего ответа'''
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            metrics, token = start_request()
+            response = await get_response(request)
+            return finish_request(request, response, metrics, token)
+    else:
+        def middleware(request):
+            metrics, token = start_request()
+            response = get_response(request)
+            return finish_request(request, response, metrics, token)
+    return middleware
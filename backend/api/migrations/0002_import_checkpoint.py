@@ -0,0 +1,26 @@
+# Generated by Django 3.2 on 2026-10-18 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Выгрузка')),
+                ('offset', models.PositiveBigIntegerField(default=0, verbose_name='Смещение')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлена')),
+            ],
+            options={
+                'verbose_name': 'Отметка загрузки',
+                'verbose_name_plural': 'Отметки загрузки',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+
+class CachedReferenceMixin:
+    '''Отдаёт готовый JSON справочника из кэша без запросов к базе'''
+
+    reference_cache = None
+
+    def cached_response(self, key, method, *args, **kwargs):
+        if self.request.accepted_renderer.format != 'json':
+            return method(*args, **kwargs)
+        content = self.reference_cache.get_or_set(
+            key,
+            lambda: JSONRenderer().render(method(*args, **kwargs).data))
+        return HttpResponse(content, content_type='application/json')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            'list', super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            f'retrieve:{kwargs[self.lookup_url_kwarg or self.lookup_field]}',
+            super().retrieve, request, *args, **kwargs)
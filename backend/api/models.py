@@ -0,0 +1,75 @@
+import uuid
+
+from django.db import models
+from django.utils import timezone
+
+from users.models import User
+
+
+class Job(models.Model):
+    '''Фоновая задача'''
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+                          editable=False)
+    kind = models.CharField(verbose_name='Тип', max_length=50)
+    key = models.CharField(verbose_name='Ключ', max_length=200, blank=True)
+    user = models.ForeignKey(User,
+                             verbose_name='Пользователь',
+                             on_delete=models.CASCADE,
+                             null=True,
+                             related_name='jobs')
+    payload = models.JSONField(verbose_name='Параметры', default=dict)
+    status = models.CharField(verbose_name='Статус',
+                              max_length=10,
+                              choices=STATUSES,
+                              default=PENDING)
+    attempts = models.PositiveSmallIntegerField(verbose_name='Попытки',
+                                                default=0)
+    result = models.CharField(verbose_name='Результат', max_length=255,
+                              blank=True)
+    error = models.TextField(verbose_name='Ошибка', blank=True)
+    created = models.DateTimeField(verbose_name='Создана', auto_now_add=True)
+    run_at = models.DateTimeField(verbose_name='Запустить после',
+                                  default=timezone.now)
+    started = models.DateTimeField(verbose_name='Запущена', null=True)
+    finished = models.DateTimeField(verbose_name='Завершена', null=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = (
+            models.Index(fields=('status', 'run_at'),
+                         name='job_status_run_at_idx'),
+            models.Index(fields=('kind', 'key'), name='job_kind_key_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.kind} {self.id}: {self.status}'
+
+
+class ImportCheckpoint(models.Model):
+    '''Отметка загрузки выгрузки рецептов'''
+
+    name = models.CharField(verbose_name='Выгрузка', max_length=255,
+                            unique=True)
+    offset = models.PositiveBigIntegerField(verbose_name='Смещение',
+                                            default=0)
+    updated = models.DateTimeField(verbose_name='Обновлена', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Отметка загрузки'
+        verbose_name_plural = 'Отметки загрузки'
+
+    def __str__(self):
+        return f'{self.name}: {self.offset}'
@@ -0,0 +1,109 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from threading import Event
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+
+STREAM_BUFFER_PARTS = 16
+
+executor = ThreadPoolExecutor(max_workers=settings.VIEW_WORKERS,
+                              thread_name_prefix='views')
+
+
+def call_view(view, request, *args, **kwargs):
+    '''Выполняет синхронное представление целиком в потоке пула.
+
+    Ответ рендерится здесь же, а потоковое содержимое помечается,
+    чтобы OffloadASGIHandler читал его тоже в потоке пула.
+    '''
+
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response = response.render()
+        response.offloaded = response.streaming
+        return response
+    finally:
+        close_old_connections()
+
+
+def offload(view):
+    '''Асинхронная обёртка, отправляющая представление в ограниченный пул'''
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(executor, partial(
+            context.run, call_view, view, request, *args, **kwargs))
+    return async_view
+
+
+def offload_patterns(patterns, names):
+    for pattern in patterns:
+        if pattern.name in names:
+            pattern.callback = offload(pattern.callback)
+    return patterns
+
+
+def pump_parts(response, loop, queue, stopped):
+    '''Читает потоковый ответ в потоке пула и передаёт части в очередь'''
+
+    try:
+        close_old_connections()
+        for part in response:
+            if stopped.is_set():
+                break
+            asyncio.run_coroutine_threadsafe(queue.put(part), loop).result()
+        close_old_connections()
+    finally:
+        asyncio.run_coroutine_threadsafe(queue.put(None), loop).result()
+
+
+class OffloadASGIHandler(ASGIHandler):
+    '''ASGI обработчик, читающий потоковые ответы пула в потоке пула.
+
+    Django 3.2 перебирает потоковый ответ прямо в цикле событий,
+    поэтому запросы к базе из генератора выполнялись бы в нём.
+    Части передаются через очередь на STREAM_BUFFER_PARTS элементов,
+    так что в памяти держится только небольшой буфер ответа.
+    '''
+
+    async def send_response(self, response, send):
+        if not getattr(response, 'offloaded', False):
+            return await super().send_response(response, send)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                *((header.encode('ascii'), value.encode('latin1'))
+                  for header, value in response.items()),
+                *((b'Set-Cookie',
+                   cookie.output(header='').encode('ascii').strip())
+                  for cookie in response.cookies.values())],
+        })
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=STREAM_BUFFER_PARTS)
+        stopped = Event()
+        pumping = loop.run_in_executor(
+            executor, contextvars.copy_context().run,
+            pump_parts, response, loop, queue, stopped)
+        part = await queue.get()
+        try:
+            while part is not None:
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({'type': 'http.response.body',
+                                'body': chunk, 'more_body': True})
+                part = await queue.get()
+        finally:
+            stopped.set()
+            while part is not None:
+                part = await queue.get()
+            await pumping
+        await send({'type': 'http.response.body'})
+        await loop.run_in_executor(executor, response.close)
@@ -1,7 +1,130 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class PageNumberPaginationLimit(PageNumberPagination):
     """Нумерация страниц"""
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(BasePagination):
+    """Постраничный вывод по курсору без OFFSET и COUNT(*)"""
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def __init__(self, ordering):
+        self.ordering = [(field.lstrip('-'), field.startswith('-'))
+                         for field in ordering]
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size and page_size.isdigit() and int(page_size) > 0:
+            return min(int(page_size), self.max_page_size)
+        return self.page_size
+
+    def encode_cursor(self, obj, reverse):
+        values = [getattr(obj, name) for name, _ in self.ordering]
+        payload = json.dumps({'v': values, 'r': reverse}, default=str)
+        return urlsafe_b64encode(payload.encode()).decode()
+
+    def to_python(self, model, name, value):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return float(value)
+        return field.to_python(value)
+
+    def decode_cursor(self, cursor, model):
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor.encode()))
+            values = [self.to_python(model, name, value)
+                      for (name, _), value in zip(self.ordering,
+                                                  payload['v'])]
+            reverse = bool(payload['r'])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def get_keyset_filter(self, values, reverse):
+        keyset_filter = Q()
+        for i, (name, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition = Q(**{f'{name}__{lookup}': values[i]})
+            for (previous, _), value in zip(self.ordering[:i], values):
+                condition &= Q(**{previous: value})
+            keyset_filter |= condition
+        return keyset_filter
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        reverse = False
+        if cursor:
+            values, reverse = self.decode_cursor(cursor, queryset.model)
+            queryset = queryset.filter(
+                self.get_keyset_filter(values, reverse))
+        queryset = queryset.order_by(*(
+            ('-' if descending != reverse else '') + name
+            for name, descending in self.ordering))
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+        self.next_cursor = self.previous_cursor = None
+        if results and (has_more or reverse):
+            self.next_cursor = self.encode_cursor(results[-1], False)
+        if results and cursor and (has_more or not reverse):
+            self.previous_cursor = self.encode_cursor(results[0], True)
+        return results
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(),
+                                   self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict((
+            ('next', self.get_link(self.next_cursor)),
+            ('previous', self.get_link(self.previous_cursor)),
+            ('results', data),
+        )))
+
+
+class PageNumberOrKeysetPagination(PageNumberPaginationLimit):
+    """Нумерация страниц, с параметром cursor - вывод по курсору"""
+    keyset_ordering = ('-date', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+        self.keyset = KeysetPagination(
+            getattr(view, 'keyset_ordering', None) or self.keyset_ordering)
+        return self.keyset.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class UserPagination(PageNumberOrKeysetPagination):
+    """Нумерация страниц пользователей или вывод по курсору"""
+    keyset_ordering = ('id',)
@@ -0,0 +1,106 @@
+from django.core.cache import cache
+
+from api.caches import ingredient_cache, recipe_feed_cache, tag_cache
+from api.metrics import timed_serialization
+from api.serializers import RecipePayloadSerializer, RecipeReadSerializer
+from recipes.models import Favourite, Recipe, ShoppingCart
+from users.models import Follow
+
+RECIPE_PAYLOAD_KEY = 'recipe_payload:{}:{}:{}:{}'
+RECIPE_PAYLOAD_TIMEOUT = 60 * 60 * 24
+RECIPE_PAYLOAD_PENDING_TIMEOUT = 60
+RECIPE_PAYLOAD_SIZES = ('card', 'detail')
+
+
+def get_payload_keys(pks, size):
+    tag_version = tag_cache.get_version()
+    ingredient_version = ingredient_cache.get_version()
+    return {pk: RECIPE_PAYLOAD_KEY.format(tag_version, ingredient_version,
+                                          size, pk)
+            for pk in pks}
+
+
+def invalidate_recipe_payloads(*pks):
+    cache.delete_many([key for size in RECIPE_PAYLOAD_SIZES
+                       for key in get_payload_keys(pks, size).values()])
+
+
+def invalidate_recipes(*pks):
+    '''Сброс кэша рецептов и анонимной ленты'''
+
+    invalidate_recipe_payloads(*pks)
+    recipe_feed_cache.invalidate()
+
+
+def get_recipe_payloads(pks, size):
+    '''Общие для всех пользователей данные рецептов из кэша.
+
+    Отсутствующие в кэше рецепты собираются одним набором запросов.
+    Пока миниатюры нет, данные с адресом оригинала хранятся недолго:
+    сигнал о готовой миниатюре сбрасывает кэш только в процессе,
+    который её создал.
+    Возвращает словарь id - данные, удалённых рецептов в нём нет.
+    '''
+
+    keys = get_payload_keys(pks, size)
+    cached = cache.get_many(keys.values())
+    missing = [pk for pk, key in keys.items() if key not in cached]
+    if missing:
+        recipes = Recipe.objects.with_related().select_related(
+            'author').filter(pk__in=missing)
+        built, pending = {}, {}
+        for recipe in recipes:
+            payload = RecipePayloadSerializer(
+                recipe, context={'thumbnail_size': size}).data
+            if recipe.image and payload['image'] == recipe.image.url:
+                pending[keys[recipe.pk]] = payload
+            else:
+                built[keys[recipe.pk]] = payload
+        cache.set_many(built, RECIPE_PAYLOAD_TIMEOUT)
+        cache.set_many(pending, RECIPE_PAYLOAD_PENDING_TIMEOUT)
+        cached.update(built)
+        cached.update(pending)
+    return {pk: cached[key] for pk, key in keys.items() if key in cached}
+
+
+def get_user_flags(user, payloads):
+    '''Избранное, покупки и подписки пользователя для набора рецептов'''
+
+    if user.is_anonymous or not payloads:
+        return set(), set(), set()
+    author_ids = {payload['author']['id'] for payload in payloads.values()}
+    return (
+        set(Favourite.objects.filter(
+            user=user, recipe_id__in=payloads).values_list(
+            'recipe_id', flat=True)),
+        set(ShoppingCart.objects.filter(
+            user=user, recipe_id__in=payloads).values_list(
+            'recipe_id', flat=True)),
+        set(Follow.objects.filter(
+            user=user, author_id__in=author_ids).values_list(
+            'author_id', flat=True)),
+    )
+
+
+def render_recipes(request, pks, size):
+    '''Данные рецептов в формате RecipeReadSerializer для пользователя'''
+
+    payloads = get_recipe_payloads(pks, size)
+    favorited, in_cart, subscribed = get_user_flags(request.user, payloads)
+    results = []
+    with timed_serialization():
+        for pk in pks:
+            payload = payloads.get(pk)
+            if payload is None:
+                continue
+            data = dict(
+                payload,
+                author=dict(payload['author'], is_subscribed=(
+                    payload['author']['id'] in subscribed)),
+                is_favorited=pk in favorited,
+                is_in_shopping_cart=pk in in_cart,
+                image=(request.build_absolute_uri(payload['image'])
+                       if payload['image'] else None))
+            results.append({name: data[name]
+                            for name in RecipeReadSerializer.Meta.fields})
+    return results
@@ -0,0 +1,162 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField, Q
+
+from api.caches import recipe_feed_cache
+from recipes.models import (Favourite, RankingCheckpoint, Recipe,
+                            RecipeRanking, ShoppingCart)
+
+RANKING_ORDERINGS = {
+    'popular': 'popular_score',
+    'trending': 'trending_score',
+}
+FAVOURITE_WEIGHT = 2.0
+SHOPPING_CART_WEIGHT = 1.0
+RANKING_SOURCES = (
+    ('favourite', Favourite, FAVOURITE_WEIGHT),
+    ('shopping_cart', ShoppingCart, SHOPPING_CART_WEIGHT),
+)
+TRENDING_EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+TRENDING_HALF_LIFE = 7 * 24 * 60 * 60
+TRENDING_RATE = math.log(2) / TRENDING_HALF_LIFE
+RANKING_BATCH_SIZE = 5000
+RANKING_SETTLE_TIME = timedelta(minutes=5)
+
+
+def trending_weight(created):
+    '''Логарифм веса события с затуханием по времени.
+
+    Вес растёт экспоненциально от общей эпохи, поэтому порядок рецептов
+    совпадает с порядком по затухающей оценке на любой момент времени,
+    а новые события только добавляются к сумме без пересчёта старых.
+    Сам вес через несколько лет не помещается во float, поэтому
+    оценка хранится как логарифм суммы весов.
+    '''
+
+    return TRENDING_RATE * (created - TRENDING_EPOCH).total_seconds()
+
+
+def log_add(first, second):
+    '''log(exp(first) + exp(second)) без переполнения'''
+
+    if first < second:
+        first, second = second, first
+    return first + math.log1p(math.exp(second - first))
+
+
+def popular_score(favorites_count, in_carts_count):
+    return (FAVOURITE_WEIGHT * favorites_count
+            + SHOPPING_CART_WEIGHT * in_carts_count)
+
+
+def get_settled_time():
+    '''Граница, до которой все записи источников уже зафиксированы.
+
+    Время created ставится до коммита, поэтому запись с меньшим id
+    или временем может стать видна позже соседних. Такие записи
+    учитываются, пока транзакция длится не дольше RANKING_SETTLE_TIME.
+    '''
+
+    return datetime.now(timezone.utc) - RANKING_SETTLE_TIME
+
+
+def collect_trending(checkpoints, batch_size):
+    settled = get_settled_time()
+    deltas = {}
+    for source, model, weight in RANKING_SOURCES:
+        checkpoint = checkpoints[source]
+        rows = model.objects.filter(created__lt=settled)
+        if checkpoint.last_created is not None:
+            rows = rows.filter(
+                Q(created__gt=checkpoint.last_created)
+                | Q(created=checkpoint.last_created,
+                    pk__gt=checkpoint.last_id))
+        rows = rows.order_by('created', 'pk').values_list(
+            'pk', 'recipe_id', 'created')
+        for pk, recipe_id, created in rows.iterator(chunk_size=batch_size):
+            delta = math.log(weight) + trending_weight(created)
+            if recipe_id in deltas:
+                delta = log_add(deltas[recipe_id], delta)
+            deltas[recipe_id] = delta
+            checkpoint.last_created, checkpoint.last_id = created, pk
+    return deltas
+
+
+def create_rankings(recipe_ids):
+    '''Пустые строки рейтинга для новых рецептов'''
+
+    RecipeRanking.objects.bulk_create(
+        [RecipeRanking(recipe_id=pk) for pk in recipe_ids],
+        batch_size=RANKING_BATCH_SIZE, ignore_conflicts=True)
+
+
+def apply_deltas(deltas, batch_size):
+    recipe_ids = sorted(deltas)
+    for start in range(0, len(recipe_ids), batch_size):
+        ids = recipe_ids[start:start + batch_size]
+        counters = Recipe.objects.filter(pk__in=ids).values_list(
+            'pk', 'favorites_count', 'in_carts_count')
+        rankings = RecipeRanking.objects.in_bulk(ids)
+        created, updated = [], []
+        for pk, favorites_count, in_carts_count in counters:
+            ranking = rankings.get(pk)
+            if ranking is None:
+                ranking = RecipeRanking(recipe_id=pk,
+                                        trending_score=deltas[pk])
+                created.append(ranking)
+            else:
+                ranking.trending_score = log_add(ranking.trending_score,
+                                                 deltas[pk])
+                updated.append(ranking)
+            ranking.popular_score = popular_score(
+                favorites_count, in_carts_count)
+        RecipeRanking.objects.bulk_create(created)
+        RecipeRanking.objects.bulk_update(
+            updated, ('popular_score', 'trending_score'))
+
+
+def sync_popular(batch_size):
+    '''Обновляет популярность рецептов, у которых разошлись счётчики'''
+
+    expected = (FAVOURITE_WEIGHT * F('recipe__favorites_count')
+                + SHOPPING_CART_WEIGHT * F('recipe__in_carts_count'))
+    drifted = RecipeRanking.objects.annotate(
+        expected=ExpressionWrapper(expected, output_field=FloatField()),
+    ).exclude(popular_score=F('expected')).values_list('pk', 'expected')
+    rankings = [RecipeRanking(recipe_id=pk, popular_score=score)
+                for pk, score in drifted.iterator(chunk_size=batch_size)]
+    RecipeRanking.objects.bulk_update(
+        rankings, ('popular_score',), batch_size=batch_size)
+    return len(rankings)
+
+
+@transaction.atomic
+def refresh_rankings(full=False, batch_size=RANKING_BATCH_SIZE):
+    '''Пересчёт рейтинга по новым записям избранного и списков покупок.
+
+    Без full учитываются только записи после сохранённых отметок,
+    full пересчитывает тренд с нуля. Популярность сверяется
+    со счётчиками рецептов, поэтому удаления из избранного тоже учитываются.
+    Возвращает число рецептов с новыми событиями и с исправленной
+    популярностью.
+    '''
+
+    for source, _, _ in RANKING_SOURCES:
+        RankingCheckpoint.objects.get_or_create(source=source)
+    checkpoints = {
+        checkpoint.source: checkpoint
+        for checkpoint in RankingCheckpoint.objects.select_for_update()}
+    if full:
+        RecipeRanking.objects.update(trending_score=0)
+        for checkpoint in checkpoints.values():
+            checkpoint.last_created, checkpoint.last_id = None, 0
+    create_rankings(Recipe.objects.filter(
+        ranking__isnull=True).values_list('pk', flat=True))
+    deltas = collect_trending(checkpoints, batch_size)
+    apply_deltas(deltas, batch_size)
+    RankingCheckpoint.objects.bulk_update(
+        checkpoints.values(), ('last_created', 'last_id'))
+    transaction.on_commit(recipe_feed_cache.invalidate)
+    return len(deltas), sync_popular(batch_size)
@@ -0,0 +1,161 @@
+import operator
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from functools import reduce
+from threading import Lock
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, Value, When
+
+from api.caches import recipe_search_cache
+from recipes.models import Recipe, RecipeIngredients, RecipeSearch
+
+SEARCH_CONFIG = 'russian'
+SEARCH_BATCH_SIZE = 1000
+SEARCH_MAX_RESULTS = 500
+SEARCH_WEIGHTS = (
+    ('name', 'A', 1.0),
+    ('ingredients', 'B', 0.4),
+    ('text', 'C', 0.2),
+)
+WORD = re.compile(r'\w+')
+
+
+def tokenize(value):
+    return WORD.findall(value.casefold())
+
+
+def get_search_vector():
+    return reduce(operator.add, (
+        SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        for field, weight, _ in SEARCH_WEIGHTS))
+
+
+def build_documents(recipe_ids):
+    ingredients = defaultdict(list)
+    for recipe_id, name in RecipeIngredients.objects.filter(
+            recipe_id__in=recipe_ids).order_by('pk').values_list(
+            'recipe_id', 'ingredient__name'):
+        ingredients[recipe_id].append(name)
+    return [
+        RecipeSearch(recipe_id=pk, name=name, text=text,
+                     ingredients=' '.join(ingredients[pk]))
+        for pk, name, text in Recipe.objects.filter(
+            pk__in=recipe_ids).values_list('pk', 'name', 'text')]
+
+
+def update_search(recipe_ids, batch_size=SEARCH_BATCH_SIZE):
+    '''Пересобирает поисковые документы указанных рецептов.
+
+    Документ заменяется целиком, на PostgreSQL вектор с весами
+    названия, ингредиентов и текста считается одним UPDATE на пачку.
+    '''
+
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), batch_size):
+        ids = recipe_ids[start:start + batch_size]
+        documents = build_documents(ids)
+        with transaction.atomic():
+            RecipeSearch.objects.filter(pk__in=ids).delete()
+            RecipeSearch.objects.bulk_create(documents,
+                                             ignore_conflicts=True)
+            if connection.vendor == 'postgresql':
+                RecipeSearch.objects.filter(pk__in=ids).update(
+                    vector=get_search_vector())
+    transaction.on_commit(recipe_search_cache.invalidate)
+
+
+class DatabaseSearch:
+    '''Полнотекстовый поиск PostgreSQL по GIN индексу вектора'''
+
+    def filter(self, queryset, query):
+        search_query = SearchQuery(query, config=SEARCH_CONFIG,
+                                   search_type='websearch')
+        return queryset.filter(search__vector=search_query).annotate(
+            search_rank=SearchRank(F('search__vector'), search_query))
+
+
+class InMemorySearch:
+    '''Поиск рецептов по инвертированному индексу в памяти процесса.
+
+    Используется вместо PostgreSQL, например на SQLite в тестах.
+    Слова запроса ищутся как префиксы слов документа, вес совпадения
+    зависит от поля. Индекс перестраивается при смене версии.
+    '''
+
+    def __init__(self):
+        self._lock = Lock()
+        self._index = None
+
+    def build(self):
+        postings = defaultdict(lambda: defaultdict(float))
+        fields = [field for field, _, _ in SEARCH_WEIGHTS]
+        for pk, *values in RecipeSearch.objects.values_list(
+                'pk', *fields).iterator():
+            for value, (_, _, weight) in zip(values, SEARCH_WEIGHTS):
+                for word in tokenize(value):
+                    postings[word][pk] += weight
+        return sorted(postings), dict(postings)
+
+    def get_index(self):
+        version = recipe_search_cache.get_version()
+        index = self._index
+        if index is None or index[0] != version:
+            with self._lock:
+                if self._index is None or self._index[0] != version:
+                    self._index = (version, *self.build())
+                index = self._index
+        return index[1:]
+
+    def rank(self, query):
+        words, postings = self.get_index()
+        scores = None
+        for term in tokenize(query):
+            term_scores = defaultdict(float)
+            for position in range(bisect_left(words, term), len(words)):
+                if not words[position].startswith(term):
+                    break
+                for pk, score in postings[words[position]].items():
+                    term_scores[pk] += score
+            scores = term_scores if scores is None else {
+                pk: score + term_scores[pk]
+                for pk, score in scores.items() if pk in term_scores}
+        return scores or {}
+
+    def filter(self, queryset, query):
+        '''Лучшие SEARCH_MAX_RESULTS совпадений среди рецептов queryset.
+
+        Совпадения проверяются по queryset пачками в порядке ранга,
+        поэтому отбор делается уже после остальных фильтров.
+        '''
+
+        ranked = sorted(self.rank(query).items(), key=lambda item: -item[1])
+        allowed = set()
+        for start in range(0, len(ranked), SEARCH_MAX_RESULTS):
+            allowed.update(queryset.order_by().filter(pk__in=[
+                pk for pk, _ in ranked[start:start + SEARCH_MAX_RESULTS]
+            ]).values_list('pk', flat=True))
+            if len(allowed) >= SEARCH_MAX_RESULTS:
+                break
+        scores = [(pk, score) for pk, score in ranked
+                  if pk in allowed][:SEARCH_MAX_RESULTS]
+        if not scores:
+            return queryset.none().annotate(search_rank=Value(
+                0.0, output_field=FloatField()))
+        return queryset.filter(pk__in=[pk for pk, _ in scores]).annotate(
+            search_rank=Case(
+                *(When(pk=pk, then=Value(score)) for pk, score in scores),
+                output_field=FloatField()))
+
+
+database_search = DatabaseSearch()
+in_memory_search = InMemorySearch()
+
+
+def get_search():
+    if connection.vendor == 'postgresql':
+        return database_search
+    return in_memory_search
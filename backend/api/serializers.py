@@ -1,14 +1,40 @@
+from collections import Counter
+
+from django.db import transaction
+from django.urls import reverse
 from djoser.serializers import UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
-from rest_framework.serializers import ModelSerializer, PrimaryKeyRelatedField
+from rest_framework.serializers import ModelSerializer
 
+from api.counters import change_counter, delete_rows
+from api.fields import Base64ImageField, ThumbnailField
+from api.images import schedule_thumbnails
+from api.models import Job
+from api.utils import invalidate_recipe_carts
 from recipes.models import (Favourite, Ingredient, Recipe, RecipeIngredients,
                             ShoppingCart, Tag)
 from users.models import Follow, User
 
+RECIPE_BATCH_LIMIT = 100
+
+
+def get_objects_in_bulk(queryset, ids):
+    '''Получение объектов по списку id одним запросом'''
+
+    objects = queryset.in_bulk(ids)
+    errors = []
+    missing = [str(pk) for pk in dict.fromkeys(ids) if pk not in objects]
+    if missing:
+        errors.append(f'Не найдены объекты с id: {", ".join(missing)}.')
+    duplicates = [str(pk) for pk, count in Counter(ids).items() if count > 1]
+    if duplicates:
+        errors.append(f'Повторяются id: {", ".join(duplicates)}.')
+    if errors:
+        raise ValidationError(errors)
+    return [objects[pk] for pk in ids]
+
 
 class MeUserSerializer(UserSerializer):
     '''Пользовательский сериализатор.'''
@@ -24,14 +50,15 @@ class MeUserSerializer(UserSerializer):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return Follow.objects.filter(user=user, author=obj).exists()
 
 
 class FollowSerializer(MeUserSerializer):
     '''Сериализатор подписoк.'''
 
-    recipes_count = serializers.IntegerField(source='recipes.count',
-                                             read_only=True)
+    recipes_count = serializers.IntegerField(read_only=True)
     recipes = SerializerMethodField(method_name='get_recipes')
     is_subscribed = serializers.BooleanField(default=True)
 
@@ -44,7 +71,13 @@ class FollowSerializer(MeUserSerializer):
                             'first_name', 'last_name')
 
     def get_recipes(self, obj):
-        recipes = obj.recipes.all()
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes = obj.recipes.all()
+            recipes_limit = self.context.get('recipes_limit')
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         serializer = RecipeShortSerializer(recipes, many=True,
                                            context=self.context)
         return serializer.data
@@ -69,17 +102,29 @@ class IngredientSerializer(serializers.ModelSerializer):
 class RecipeShortSerializer(ModelSerializer):
     '''Сериализатор для отображения рецептов на странице подписок.'''
 
-    image = Base64ImageField()
+    image = ThumbnailField('subscription')
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    '''Список id рецептов для пакетных операций'''
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=RECIPE_BATCH_LIMIT)
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
 class IngredientInRecipeCreateSerializer(ModelSerializer):
     '''Сериализатор для отоброжения ингридиента при создание рецепта'''
 
-    id = PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit')
@@ -90,7 +135,7 @@ class IngredientInRecipeCreateSerializer(ModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data['id'] = instance.ingredient.id
+        data['id'] = instance.ingredient_id
         return data
 
 
@@ -101,7 +146,7 @@ class RecipeReadSerializer(ModelSerializer):
     author = MeUserSerializer(read_only=True)
     ingredients = IngredientInRecipeCreateSerializer(
         source='recipeingredients', many=True)
-    image = Base64ImageField()
+    image = ThumbnailField('card')
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
 
@@ -115,20 +160,44 @@ class RecipeReadSerializer(ModelSerializer):
         user = self.context['request'].user
         if user.is_anonymous:
             return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return Favourite.objects.filter(user=user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
         user = self.context['request'].user
         if user.is_anonymous:
             return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return ShoppingCart.objects.filter(user=user, recipe=obj).exists()
 
 
+class AuthorPayloadSerializer(MeUserSerializer):
+    '''Автор рецепта без признака подписки'''
+
+    is_subscribed = None
+
+    class Meta(MeUserSerializer.Meta):
+        fields = ('id', 'email', 'username', 'first_name', 'last_name')
+
+
+class RecipePayloadSerializer(RecipeReadSerializer):
+    '''Не зависящая от пользователя часть рецепта для кэша'''
+
+    author = AuthorPayloadSerializer(read_only=True)
+    is_favorited = None
+    is_in_shopping_cart = None
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = ('id', 'tags', 'author', 'ingredients', 'name',
+                  'image', 'text', 'cooking_time')
+
+
 class RecipeCreateSerializer(ModelSerializer):
     '''Сериализатор создания рецепта'''
 
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True)
+    tags = serializers.ListField(child=serializers.IntegerField())
     author = MeUserSerializer(read_only=True)
     ingredients = IngredientInRecipeCreateSerializer(many=True)
     image = Base64ImageField()
@@ -141,7 +210,7 @@ class RecipeCreateSerializer(ModelSerializer):
     def validate_tags(self, value):
         if not value:
             raise ValidationError('Нужно добавить тег.')
-        return value
+        return get_objects_in_bulk(Tag.objects.all(), value)
 
     def validate_ingredients(self, value):
         if not value:
@@ -149,36 +218,70 @@ class RecipeCreateSerializer(ModelSerializer):
         for i in value:
             if i['amount'] <= 0:
                 raise ValidationError('Колличество должго быть больше 0')
+        ingredients = get_objects_in_bulk(Ingredient.objects.all(),
+                                          [i['id'] for i in value])
+        for i, ingredient in zip(value, ingredients):
+            i['id'] = ingredient
         return value
 
     def to_representation(self, instance):
         request = self.context.get('request')
-        context = {'request': request}
+        context = {'request': request, 'thumbnail_size': 'detail'}
+        instance = Recipe.objects.with_related().with_user_flags(
+            request.user).get(pk=instance.pk)
         return RecipeReadSerializer(instance,
                                     context=context).data
 
+    @staticmethod
+    def create_ingredients(recipe, ingredients):
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe,
+                              ingredient=ingredient['id'],
+                              amount=ingredient['amount'])
+            for ingredient in ingredients)
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
+        change_counter(User, recipe.author_id, 'recipes_count', 1)
         recipe.tags.set(tags)
-        for ingredient in ingredients:
-            RecipeIngredients.objects.create(recipe=recipe,
-                                             ingredient=ingredient.get('id'),
-                                             amount=ingredient.get('amount'))
+        self.create_ingredients(recipe, ingredients)
+        validated_data['image'].close()
+        schedule_thumbnails(recipe.image.name)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         if tags is not None:
             instance.tags.set(tags)
         ingredients = validated_data.pop('ingredients', None)
         if ingredients is not None:
-            instance.ingredients.clear()
-            for ingredient in ingredients:
-                amount = ingredient['amount']
-                RecipeIngredients.objects.update_or_create(
-                    recipe=instance,
-                    ingredient=ingredient.get('id'),
-                    defaults={'amount': amount})
-        return super().update(instance, validated_data)
\ No newline at end of file
+            delete_rows(instance.recipeingredients.all())
+            self.create_ingredients(instance, ingredients)
+            transaction.on_commit(
+                lambda: invalidate_recipe_carts(instance.id))
+        instance = super().update(instance, validated_data)
+        if 'image' in validated_data:
+            validated_data['image'].close()
+            schedule_thumbnails(instance.image.name)
+        return instance
+
+
+class JobSerializer(ModelSerializer):
+    '''Сериализатор фоновых задач'''
+
+    result = SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ('id', 'kind', 'status', 'error', 'created', 'finished',
+                  'result')
+
+    def get_result(self, obj):
+        if obj.status != Job.DONE or not obj.result:
+            return None
+        return self.context['request'].build_absolute_uri(
+            reverse('api:job-result', args=(obj.id,)))
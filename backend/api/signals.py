@@ -0,0 +1,101 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+from api.caches import ingredient_cache, tag_cache
+from api.images import thumbnails_generated
+from api.payloads import invalidate_recipes
+from api.rankings import create_rankings
+from api.search import update_search
+from api.utils import (invalidate_cart, invalidate_ingredient_carts,
+                       invalidate_recipe_carts)
+from recipes.models import (Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, Tag)
+from users.models import User
+
+
+def invalidate_recipes_on_commit(*pks):
+    transaction.on_commit(partial(invalidate_recipes, *pks))
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    invalidate_cart(instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    transaction.on_commit(ingredient_cache.invalidate)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if created:
+        return
+    transaction.on_commit(partial(invalidate_ingredient_carts, instance.pk))
+    transaction.on_commit(lambda: update_search(
+        RecipeIngredients.objects.filter(ingredient=instance).values_list(
+            'recipe_id', flat=True).distinct()))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    transaction.on_commit(tag_cache.invalidate)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver((post_save, post_delete), sender=User)
+def user_changed(sender, instance, **kwargs):
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    token_cache.invalidate(*keys)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    if created:
+        create_rankings((instance.pk,))
+    transaction.on_commit(partial(update_search, (instance.pk,)))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredients)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    invalidate_recipes_on_commit(instance.recipe_id)
+    transaction.on_commit(
+        partial(invalidate_recipe_carts, instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        transaction.on_commit(tag_cache.invalidate)
+    else:
+        invalidate_recipes_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_recipes_on_commit(*Recipe.objects.filter(
+        author=instance).values_list('pk', flat=True))
+
+
+@receiver(thumbnails_generated)
+def recipe_thumbnails_generated(sender, name, **kwargs):
+    invalidate_recipes(*Recipe.objects.filter(
+        image=name).values_list('pk', flat=True))
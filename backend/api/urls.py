@@ -1,18 +1,32 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (IngredientViewSet, MeUserViewSet, RecipeViewSet,
-                       TagViewSet)
+from api.offload import offload_patterns
+from api.views import (IngredientViewSet, JobViewSet, MeUserViewSet,
+                       MetricsView, RecipeViewSet, TagViewSet)
 
 app_name = 'api'
 
+OFFLOADED_ROUTES = (
+    'tag-list', 'tag-detail',
+    'ingredient-list', 'ingredient-detail',
+    'recipe-list', 'recipe-detail', 'recipe-download-shopping-cart',
+)
+
 router = DefaultRouter()
 router.register('users', MeUserViewSet)
 router.register('tags', TagViewSet)
 router.register('ingredients', IngredientViewSet)
 router.register('recipes', RecipeViewSet)
+router.register('jobs', JobViewSet, basename='job')
+
+router_urls = router.urls
+if settings.SERVER_MODE == 'asgi':
+    router_urls = offload_patterns(router_urls, OFFLOADED_ROUTES)
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('', include(router_urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
\ No newline at end of file
@@ -1,49 +1,199 @@
-from django.http import FileResponse
-from reportlab.pdfgen import canvas
+import csv
+import os
+import time
+from functools import lru_cache
 from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Sum
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
 
-from api.serializers import RecipeIngredients
+from api.jobs import enqueue, get_result_name, job_accepted
+from api.models import Job
+from recipes.models import RecipeIngredients, ShoppingCart
 
+FONT_NAME = 'arial'
+FONT_PATH = os.path.join(settings.BASE_DIR, 'arial.ttf')
+FONT_SIZE = 13
+PAGE_TOP = 750
+PAGE_BOTTOM = 50
+LINE_HEIGHT = 25
+CART_OUTPUTS = ('pdf', 'txt', 'csv')
+CART_PDF_FILENAME = 'shopping_list.pdf'
+CART_SYNC_LINES = 100
+CART_VERSION_KEY = 'shopping_cart_version:{}'
+CART_DOCUMENT_KEY = 'shopping_cart_document:{}:{}'
+CART_DOCUMENT_TIMEOUT = 60 * 60 * 24
 
-def download_cart(request):
-    ingredients = RecipeIngredients.objects.filter(
-        recipe__shopping__user=request.user).values_list(
-        'ingredient__name', 'ingredient__measurement_unit',
-        'amount')
-    cart_list = {}
-    for item in ingredients:
-        name = item[0]
-        if name not in cart_list:
-            cart_list[name] = {
-                'measurement_unit': item[1],
-                'amount': item[2]}
-        else:
-            cart_list[name]['amount'] += item[2]
-    height = 700
+
+@lru_cache(maxsize=None)
+def register_font():
+    '''Регистрирует шрифт один раз на процесс'''
+
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+def get_cart_version(user_id):
+    '''Метка времени последнего изменения списка покупок'''
+
+    key = CART_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_cart(*user_ids):
+    now = time.time()
+    cache.set_many(
+        {CART_VERSION_KEY.format(user_id): now for user_id in user_ids}, None)
+
+
+def invalidate_recipe_carts(recipe_id):
+    user_ids = ShoppingCart.objects.filter(
+        recipe_id=recipe_id).values_list('user_id', flat=True)
+    invalidate_cart(*user_ids)
+
+
+def invalidate_ingredient_carts(ingredient_id):
+    user_ids = ShoppingCart.objects.filter(
+        recipe__recipeingredients__ingredient_id=ingredient_id).values_list(
+        'user_id', flat=True).distinct()
+    invalidate_cart(*user_ids)
+
+
+def get_cart_ingredients(user):
+    '''Суммы ингредиентов из списка покупок, посчитанные в базе'''
+
+    return RecipeIngredients.objects.filter(
+        recipe__shopping__user=user).values(
+        'ingredient__name', 'ingredient__measurement_unit').annotate(
+        total=Sum('amount')).order_by(
+        'ingredient__name', 'ingredient__measurement_unit')
+
+
+def cart_lines(ingredients):
+    for i, item in enumerate(ingredients, start=1):
+        yield (f"{i}. {item['ingredient__name']} – {item['total']} "
+               f"{item['ingredient__measurement_unit']}")
+
+
+def render_pdf(ingredients):
+    register_font()
     buffer = BytesIO()
-    pdfmetrics.registerFont(TTFont('arial', 'arial.ttf'))
     page = canvas.Canvas(buffer)
-    page.setFont('arial', 13)
-    page.drawString(100, 750, "Список покупок")
-    for i, (name, data) in enumerate(cart_list.items(), start=1):
-        page.drawString(
-            80, height, f"{i}. {name} – {data['amount']} {data['measurement_unit']}"
-        )
-        height -= 25
+    page.setFont(FONT_NAME, FONT_SIZE)
+    page.drawString(100, PAGE_TOP, 'Список покупок')
+    height = PAGE_TOP - 2 * LINE_HEIGHT
+    for line in cart_lines(ingredients):
+        if height < PAGE_BOTTOM:
+            page.showPage()
+            page.setFont(FONT_NAME, FONT_SIZE)
+            height = PAGE_TOP
+        page.drawString(80, height, line)
+        height -= LINE_HEIGHT
     page.showPage()
     page.save()
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename='shopping_list.pdf')
+    return buffer.getvalue()
+
 
+class Echo:
+    '''Псевдобуфер для потоковой записи csv'''
 
+    def write(self, value):
+        return value
 
 
+def stream_txt(ingredients):
+    yield 'Список покупок\n\n'
+    for line in cart_lines(ingredients):
+        yield f'{line}\n'
 
 
+def stream_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for item in ingredients:
+        yield writer.writerow((item['ingredient__name'],
+                               item['ingredient__measurement_unit'],
+                               item['total']))
+
+
+def get_cart_pdf(user, version):
+    key = CART_DOCUMENT_KEY.format(user.id, version)
+    document = cache.get(key)
+    if document is None:
+        document = render_pdf(get_cart_ingredients(user))
+        cache.set(key, document, CART_DOCUMENT_TIMEOUT)
+    return document
+
 
+def run_cart_pdf_job(job):
+    user_id, version = job.payload['user_id'], job.payload['version']
+    document = render_pdf(get_cart_ingredients(user_id))
+    cache.set(CART_DOCUMENT_KEY.format(user_id, version), document,
+              CART_DOCUMENT_TIMEOUT)
+    return default_storage.save(get_result_name(job, CART_PDF_FILENAME),
+                                ContentFile(document))
 
 
+def get_cart_job(user, version):
+    '''Задача на сборку большого PDF, если его нет в кэше'''
+
+    if cache.get(CART_DOCUMENT_KEY.format(user.id, version)) is not None:
+        return None
+    if get_cart_ingredients(user).count() <= CART_SYNC_LINES:
+        return None
+    return enqueue('shopping_cart_pdf',
+                   {'user_id': user.id, 'version': version},
+                   user=user, key=f'{user.id}:{version}')
+
+
+def download_cart(request):
+    output = request.query_params.get('output', 'pdf')
+    if output not in CART_OUTPUTS:
+        raise ValidationError(
+            {'output': f'Доступные форматы: {", ".join(CART_OUTPUTS)}.'})
+    version = get_cart_version(request.user.id)
+    etag = quote_etag(f'{request.user.id}-{version}-{output}')
+    last_modified = int(version)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = render_cart(request.user, version, output)
+    if response.status_code == status.HTTP_202_ACCEPTED:
+        return response
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
+def render_cart(user, version, output):
+    if output == 'pdf':
+        job = get_cart_job(user, version) if settings.BACKGROUND_JOBS else None
+        if job is not None and job.status != Job.DONE:
+            return job_accepted(job)
+        document = (default_storage.open(job.result) if job is not None
+                    else BytesIO(get_cart_pdf(user, version)))
+        return FileResponse(document, as_attachment=True,
+                            filename=CART_PDF_FILENAME)
+    stream = stream_txt if output == 'txt' else stream_csv
+    response = StreamingHttpResponse(
+        stream(get_cart_ingredients(user).iterator()),
+        content_type=('text/plain' if output == 'txt' else 'text/csv')
+        + '; charset=utf-8')
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{output}"')
+    return response
@@ -1,47 +1,87 @@
+import os
 from datetime import datetime
+from functools import partial
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Prefetch, prefetch_related_objects
 from django.db.models.aggregates import Sum
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse
 from rest_framework.status import HTTP_400_BAD_REQUEST
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 
-from api.filters import NameSearchFilter, RecipeFilter
-from .paginations import PageNumberPaginationLimit
+from api.autocomplete import (AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT,
+                              get_autocomplete)
+from api.caches import ingredient_cache, recipe_feed_cache, tag_cache
+from api.counters import (change_counter, clear_relations, toggle_relation,
+                          toggle_relations)
+from api.filters import RecipeFilter
+from api.metrics import registry
+from api.mixins import CachedReferenceMixin
+from api.models import Job
+from api.paginations import PageNumberOrKeysetPagination, UserPagination
+from api.payloads import render_recipes
 from api.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from api.rankings import RANKING_ORDERINGS
 from api.serializers import (FollowSerializer, IngredientSerializer,
-                             MeUserSerializer, RecipeCreateSerializer,
+                             JobSerializer, MeUserSerializer,
+                             RecipeCreateSerializer, RecipeIdsSerializer,
                              RecipeReadSerializer, RecipeShortSerializer,
                              TagSerializer)
 from api.serializers import RecipeIngredients
-from api.utils import download_cart
+from api.utils import download_cart, invalidate_cart
 from recipes.models import (Favourite, Ingredient, Recipe,
                             ShoppingCart, Tag)
 from users.models import Follow, User
 
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
 
 class MeUserViewSet(UserViewSet):
     '''Вьюсет для пользователей и подписок'''
 
     queryset = User.objects.all()
     serializer_class = MeUserSerializer
-    pagination_class = PageNumberPaginationLimit
+    pagination_class = UserPagination
+
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        if not recipes_limit.isdigit():
+            raise ValidationError({
+                'recipes_limit': 'Нужно указать целое неотрицательное число.'})
+        return int(recipes_limit)
 
     @action(detail=False,
             methods=['get'],
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         user = request.user
+        recipes_limit = self.get_recipes_limit()
         queryset = User.objects.filter(following__user=user)
         page = self.paginate_queryset(queryset)
+        recipes = Recipe.objects.all()
+        if recipes_limit is not None:
+            recipes = recipes.limit_per_author(recipes_limit)
+        prefetch_related_objects(page, Prefetch('recipes',
+                                                queryset=recipes,
+                                                to_attr='limited_recipes'))
         serializer = FollowSerializer(page,
                                       many=True,
-                                      context={'request': request})
+                                      context={'request': request,
+                                               'recipes_limit': recipes_limit})
         return self.get_paginated_response(serializer.data)
 
     @action(detail=True,
@@ -49,50 +89,71 @@ class MeUserViewSet(UserViewSet):
             permission_classes=[IsAuthenticated])
     def subscribe(self, request, id):
         user = request.user
-        author = get_object_or_404(User, id=id)
+        counter = (User, id, 'followers_count')
 
         if request.method == 'POST':
+            author = get_object_or_404(User, id=id)
             if user.id == author.id:
                 return Response({'detail': 'Нельзя подписаться на себя'},
                                 status=status.HTTP_400_BAD_REQUEST)
-            if Follow.objects.filter(author=author, user=user).exists():
+            if not toggle_relation(Follow, True, counter,
+                                   user=user, author=author):
                 return Response({'detail': 'Вы уже подписаны!'},
                                 status=status.HTTP_400_BAD_REQUEST)
-            Follow.objects.create(user=user, author=author)
-            serializer = FollowSerializer(author,
-                                          context={'request': request})
+            serializer = FollowSerializer(
+                author,
+                context={'request': request,
+                         'recipes_limit': self.get_recipes_limit()})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        if request.method == 'DELETE':
-            if not Follow.objects.filter(user=user, author=author).exists():
-                return Response({'errors': 'Вы не подписаны'},
-                                status=status.HTTP_400_BAD_REQUEST)
-            subscription = get_object_or_404(Follow,
-                                             user=user,
-                                             author=author)
-            subscription.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        if not toggle_relation(Follow, False, counter,
+                               user=user, author_id=id):
+            get_object_or_404(User, id=id)
+            return Response({'errors': 'Вы не подписаны'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CachedReferenceMixin, viewsets.ReadOnlyModelViewSet):
     '''Вьюсет тегов'''
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
+    reference_cache = tag_cache
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedReferenceMixin, viewsets.ReadOnlyModelViewSet):
     '''Вьюсет ингридиентов'''
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
-    filter_backends = (NameSearchFilter,)
-    search_fields = ('^name',)
     pagination_class = None
+    reference_cache = ingredient_cache
+
+    def get_limit(self):
+        limit = self.request.query_params.get('limit')
+        if limit is None:
+            return AUTOCOMPLETE_LIMIT
+        if not limit.isdigit() or int(limit) == 0:
+            raise ValidationError(
+                {'limit': 'Нужно указать целое положительное число.'})
+        return min(int(limit), AUTOCOMPLETE_MAX_LIMIT)
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        limit = self.get_limit()
+        return self.cached_response(f'search:{limit}:{name.casefold()}',
+                                    self.search, name, limit)
+
+    def search(self, name, limit):
+        ingredients = get_autocomplete().search(name, limit)
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -100,13 +161,69 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly,)
-    pagination_class = PageNumberPaginationLimit
+    pagination_class = PageNumberOrKeysetPagination
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
     http_method_names = [
         m for m in viewsets.ModelViewSet.http_method_names if m not in ['put']
     ]
 
+    def get_ranking_field(self):
+        ordering = self.request.query_params.get('ordering')
+        if ordering is None or self.action != 'list':
+            return None
+        if ordering not in RANKING_ORDERINGS:
+            raise ValidationError({'ordering': (
+                f'Доступные значения: {", ".join(RANKING_ORDERINGS)}.')})
+        return RANKING_ORDERINGS[ordering]
+
+    @property
+    def keyset_ordering(self):
+        if self.get_ranking_field() is not None:
+            return ('-rank_score', '-id')
+        if self.request.query_params.get('search'):
+            return ('-search_rank', '-id')
+        return None
+
+    def get_queryset(self):
+        if self.action != 'list':
+            if self.request.method in SAFE_METHODS:
+                return Recipe.objects.with_related().with_user_flags(
+                    self.request.user)
+            return Recipe.objects.all()
+        queryset = Recipe.objects.all()
+        ranking_field = self.get_ranking_field()
+        if ranking_field is not None:
+            queryset = queryset.filter(ranking__isnull=False).annotate(
+                rank_score=F(f'ranking__{ranking_field}')).order_by(
+                '-rank_score', '-id')
+        return queryset
+
+    def list_recipes(self, request):
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()))
+        return self.get_paginated_response(
+            render_recipes(request, [recipe.pk for recipe in page], 'card'))
+
+    def list(self, request, *args, **kwargs):
+        if (request.user.is_authenticated
+                or request.accepted_renderer.format != 'json'):
+            return self.list_recipes(request)
+        content = recipe_feed_cache.get_or_set(
+            ':'.join((tag_cache.get_version(),
+                      ingredient_cache.get_version(),
+                      request.build_absolute_uri())),
+            lambda: JSONRenderer().render(self.list_recipes(request).data))
+        return HttpResponse(content, content_type='application/json')
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_field]
+        results = render_recipes(request, [int(pk)], 'detail') if (
+            pk.isdigit()) else None
+        if not results:
+            raise Http404
+        return Response(results[0])
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeReadSerializer
@@ -118,57 +235,93 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save(author=self.request.user)
 
-    @action(detail=True,
-            methods=['post', 'delete'],
-            permission_classes=[IsAuthenticated])
-    def favorite(self, request, pk=None):
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        change_counter(User, instance.author_id, 'recipes_count', -1)
+
+    def toggle_recipe(self, model, counter_field, exists_error,
+                      missing_error, on_change=None):
         user = self.request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
+        pk = self.kwargs['pk']
+        counter = (Recipe, pk, counter_field)
 
         if self.request.method == 'POST':
-            if Favourite.objects.filter(user=user, recipe=recipe).exists():
-                return Response({'errors': 'Рецепт уже в избранном'},
+            recipe = get_object_or_404(Recipe, pk=pk)
+            if not toggle_relation(model, True, counter, on_change,
+                                   user=user, recipe=recipe):
+                return Response({'errors': exists_error},
                                 status=status.HTTP_400_BAD_REQUEST)
-            Favourite.objects.create(user=user, recipe=recipe)
             serializer = RecipeShortSerializer(
-                recipe, context={'request': request})
+                recipe, context={'request': self.request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        if self.request.method == 'DELETE':
-            if not Favourite.objects.filter(user=user, recipe=recipe).exists():
-                return Response({'errors': 'Рецепта нет в избранном'},
-                                status=status.HTTP_400_BAD_REQUEST)
-            favorite = get_object_or_404(Favourite, user=user, recipe=recipe)
-            favorite.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        if not toggle_relation(model, False, counter, on_change,
+                               user=user, recipe_id=pk):
+            get_object_or_404(Recipe, pk=pk)
+            return Response({'errors': missing_error},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True,
+            methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated])
+    def favorite(self, request, pk=None):
+        return self.toggle_recipe(Favourite, 'favorites_count',
+                                  'Рецепт уже в избранном',
+                                  'Рецепта нет в избранном')
 
     @action(detail=True,
             methods=['post', 'delete'],
             permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, pk=None):
-        user = self.request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
+        return self.toggle_recipe(ShoppingCart, 'in_carts_count',
+                                  'Уже в списке',
+                                  'Рецепта нет в списке покупок',
+                                  partial(invalidate_cart, request.user.id))
 
-        if self.request.method == 'POST':
-            if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-                return Response({'errors': 'Уже в списке'},
-                                status=status.HTTP_400_BAD_REQUEST)
-            ShoppingCart.objects.create(user=user, recipe=recipe)
-            serializer = RecipeShortSerializer(
-                recipe, context={'request': request})
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def toggle_recipes(self, model, counter_field, exists_error,
+                       missing_error, on_change=None):
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        add = self.request.method == 'POST'
+        applied, unchanged, missing = toggle_relations(
+            model, add, 'recipe', serializer.validated_data['recipes'],
+            counter_field, on_change, user=self.request.user)
+        error = exists_error if add else missing_error
+        return Response({
+            'applied': applied,
+            'skipped': [{'id': pk, 'errors': error} for pk in unchanged] + [
+                {'id': pk, 'errors': 'Рецепт не найден'} for pk in missing],
+        })
 
-        if self.request.method == 'DELETE':
-            if not ShoppingCart.objects.filter(user=user,
-                                               recipe=recipe).exists():
-                return Response({'errors': 'Рецепта нет в списке покупок'},
-                                status=status.HTTP_400_BAD_REQUEST)
-            shopping_cart = get_object_or_404(
-                ShoppingCart, user=user, recipe=recipe)
-            shopping_cart.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='favorite',
+            permission_classes=[IsAuthenticated])
+    def favorite_batch(self, request):
+        return self.toggle_recipes(Favourite, 'favorites_count',
+                                   'Рецепт уже в избранном',
+                                   'Рецепта нет в избранном')
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='shopping_cart',
+            permission_classes=[IsAuthenticated])
+    def shopping_cart_batch(self, request):
+        return self.toggle_recipes(ShoppingCart, 'in_carts_count',
+                                   'Уже в списке',
+                                   'Рецепта нет в списке покупок',
+                                   partial(invalidate_cart, request.user.id))
+
+    @action(detail=False,
+            methods=['delete'],
+            permission_classes=[IsAuthenticated])
+    def clear_shopping_cart(self, request):
+        clear_relations(ShoppingCart, 'recipe', 'in_carts_count',
+                        partial(invalidate_cart, request.user.id),
+                        user=request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False,
             methods=['get'],
@@ -176,3 +329,32 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def download_shopping_cart(self, request):
         return download_cart(request)
 
+
+class JobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    '''Статус и результат фоновых задач пользователя'''
+
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def result(self, request, pk=None):
+        job = self.get_object()
+        if job.status != Job.DONE or not job.result:
+            return Response({'errors': 'Результат ещё не готов.'},
+                            status=status.HTTP_409_CONFLICT)
+        return FileResponse(default_storage.open(job.result),
+                            as_attachment=True,
+                            filename=os.path.basename(job.result))
+
+
+class MetricsView(APIView):
+    '''Метрики процесса в формате Prometheus, только для администраторов'''
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(registry.render(),
+                            content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,131 @@
+from queue import Empty, Full, LifoQueue
+from threading import Lock
+
+from django.db.backends.postgresql import base
+
+_pools = {}
+_pools_lock = Lock()
+
+
+class ConnectionPool:
+    '''Простаивающие соединения процесса для одной базы'''
+
+    def __init__(self, size):
+        self.idle = LifoQueue(maxsize=size)
+        self.opened = 0
+        self.reused = 0
+
+    def get(self):
+        try:
+            return self.idle.get_nowait()
+        except Empty:
+            return None
+
+    def put(self, connection):
+        try:
+            self.idle.put_nowait(connection)
+        except Full:
+            return False
+        return True
+
+
+def get_pool(alias, size):
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(size)
+        return _pools[alias]
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        while True:
+            connection = pool.get()
+            if connection is None:
+                break
+            connection.close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    '''PostgreSQL с проверкой постоянных соединений и пулом в процессе.
+
+    HEALTH_CHECKS проверяет повторно используемое соединение перед первым
+    запросом в рамках HTTP-запроса. POOL_SIZE > 0 возвращает закрываемые
+    соединения в пул вместо разрыва, так что при CONN_MAX_AGE = 0
+    соединение отдаётся другим потокам после каждого запроса.
+    '''
+
+    health_check_done = False
+
+    @property
+    def pool(self):
+        size = self.settings_dict.get('POOL_SIZE', 0)
+        if not size:
+            return None
+        return get_pool(self.alias, size)
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('HEALTH_CHECKS', False)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        while pool is not None:
+            connection = pool.get()
+            if connection is None:
+                break
+            if connection.closed or (
+                    self.health_check_enabled
+                    and not self.ping(connection)):
+                connection.close()
+                continue
+            pool.reused += 1
+            return connection
+        connection = super().get_new_connection(conn_params)
+        if pool is not None:
+            pool.opened += 1
+        return connection
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def ping(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()
+        except base.Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        pool = self.pool
+        connection = self.connection
+        if (pool is None or connection is None or connection.closed
+                or self.errors_occurred):
+            return super()._close()
+        try:
+            connection.reset()
+        except base.Database.Error:
+            return super()._close()
+        if not pool.put(connection):
+            return super()._close()
+
+    def close_if_health_check_failed(self):
+        if (self.connection is None or not self.health_check_enabled
+                or self.health_check_done):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
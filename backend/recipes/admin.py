@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from api.utils import invalidate_recipe_carts
 from recipes.models import (Favourite, Ingredient, Recipe, RecipeIngredients,
                             ShoppingCart, Tag)
 
@@ -34,7 +35,11 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (RecipeIngredientsInLine,)
 
     def favarite_count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        invalidate_recipe_carts(form.instance.id)
 
 
 @admin.register(RecipeIngredients)
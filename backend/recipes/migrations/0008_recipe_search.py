@@ -0,0 +1,48 @@
+# Generated by Django 3.2 on 2026-10-18 02:52
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS recipes_recipesearch_vector_idx '
+    'ON recipes_recipesearch USING gin (vector)',
+)
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS recipes_recipesearch_vector_idx',
+)
+
+
+def run_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_ranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearch',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('name', models.CharField(max_length=200, verbose_name='Название')),
+                ('ingredients', models.TextField(verbose_name='Ингридиенты')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ рецепта',
+                'verbose_name_plural': 'Поисковые документы рецептов',
+            },
+        ),
+        migrations.RunPython(run_postgresql(INDEXES),
+                             run_postgresql(DROP_INDEXES)),
+    ]
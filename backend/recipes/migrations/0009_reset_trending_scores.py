@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def reset_rankings(apps, schema_editor):
+    '''Оценка тренда теперь хранится как логарифм, рейтинг пересобирается'''
+
+    apps.get_model('recipes', 'RecipeRanking').objects.all().delete()
+    apps.get_model('recipes', 'RankingCheckpoint').objects.update(last_id=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_rankings, migrations.RunPython.noop),
+    ]
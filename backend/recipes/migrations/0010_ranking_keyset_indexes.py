@@ -0,0 +1,69 @@
+# Generated by Django 3.2 on 2026-10-18 03:27
+
+from itertools import islice
+
+from django.db import migrations, models
+
+BATCH_SIZE = 5000
+FAVOURITE_WEIGHT = 2.0
+SHOPPING_CART_WEIGHT = 1.0
+
+
+def create_rankings(apps, schema_editor):
+    '''Строка рейтинга для каждого рецепта'''
+
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeRanking = apps.get_model('recipes', 'RecipeRanking')
+    rows = Recipe.objects.filter(ranking__isnull=True).values_list(
+        'pk', 'favorites_count', 'in_carts_count').iterator(
+        chunk_size=BATCH_SIZE)
+    while True:
+        rankings = [
+            RecipeRanking(recipe_id=pk, popular_score=(
+                FAVOURITE_WEIGHT * favorites_count
+                + SHOPPING_CART_WEIGHT * in_carts_count))
+            for pk, favorites_count, in_carts_count in islice(
+                rows, BATCH_SIZE)]
+        if not rankings:
+            break
+        RecipeRanking.objects.bulk_create(rankings, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_reset_trending_scores'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reciperanking',
+            name='ranking_popular_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='reciperanking',
+            name='ranking_trending_idx',
+        ),
+        migrations.AddField(
+            model_name='rankingcheckpoint',
+            name='last_created',
+            field=models.DateTimeField(null=True, verbose_name='Время последней записи'),
+        ),
+        migrations.AddIndex(
+            model_name='favourite',
+            index=models.Index(fields=['created', 'id'], name='favourite_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['-popular_score', '-recipe'], name='ranking_popular_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['-trending_score', '-recipe'], name='ranking_trending_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['created', 'id'], name='shopping_cart_created_idx'),
+        ),
+        migrations.RunPython(create_rankings, migrations.RunPython.noop),
+    ]
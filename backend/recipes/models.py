@@ -1,10 +1,11 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models import UniqueConstraint
 from django.core.exceptions import ValidationError
 
 from api.validators import validate_year, validate_ingredients
-from users.models import User
+from users.models import CountersMixin, Follow, User
 
 
 class Tag(models.Model):
@@ -40,12 +41,47 @@ class Ingredient(models.Model):
         verbose_name = 'Ингридиент'
         verbose_name_plural = 'Ингридиенты'
         ordering = ('pk',)
+        constraints = (
+            UniqueConstraint(fields=('name', 'measurement_unit'),
+                             name='unique_ingredient'),
+        )
 
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    '''Запросы рецептов'''
+
+    def with_related(self):
+        return self.prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipeingredients',
+                queryset=RecipeIngredients.objects.select_related(
+                    'ingredient')))
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            return self.select_related('author')
+        return self.annotate(
+            is_favorited=models.Exists(Favourite.objects.filter(
+                user=user, recipe=models.OuterRef('pk'))),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk'))),
+        ).prefetch_related(models.Prefetch(
+            'author',
+            queryset=User.objects.annotate(is_subscribed=models.Exists(
+                Follow.objects.filter(user=user,
+                                      author=models.OuterRef('pk'))))))
+
+    def limit_per_author(self, limit):
+        return self.filter(pk__in=models.Subquery(
+            self.model.objects.filter(
+                author=models.OuterRef('author')).values('pk')[:limit]))
+
+
+class Recipe(CountersMixin, models.Model):
     '''Модель Рецепт'''
 
     author = models.ForeignKey(User,
@@ -73,11 +109,23 @@ class Recipe(models.Model):
     date = models.DateTimeField(verbose_name='Дата публикации',
                                 validators=(validate_year,),
                                 auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном', default=0, editable=False)
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок', default=0, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+    counter_fields = ('favorites_count', 'in_carts_count')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-date',)
+        indexes = (
+            models.Index(fields=('-date', '-id'), name='recipe_date_id_idx'),
+            models.Index(fields=('author', '-date'),
+                         name='recipe_author_date_idx'),
+        )
 
     def __str__(self):
         return str(self.name)
@@ -116,6 +164,8 @@ class Favourite(models.Model):
                                verbose_name='Рецепт',
                                on_delete=models.CASCADE,
                                related_name='favorites')
+    created = models.DateTimeField(verbose_name='Дата добавления',
+                                   auto_now_add=True)
 
     class Meta:
         verbose_name = 'Избранное'
@@ -124,6 +174,10 @@ class Favourite(models.Model):
             UniqueConstraint(fields=('user', 'recipe'),
                              name='unique_favourite'),
         )
+        indexes = (
+            models.Index(fields=('created', 'id'),
+                         name='favourite_created_idx'),
+        )
 
     def __str__(self):
         return f'Добавленно в избранное {self.recipe}'
@@ -140,6 +194,8 @@ class ShoppingCart(models.Model):
                                verbose_name='Рецепт',
                                on_delete=models.CASCADE,
                                related_name='shopping')
+    created = models.DateTimeField(verbose_name='Дата добавления',
+                                   auto_now_add=True)
 
     class Meta:
         verbose_name = 'Покупка'
@@ -148,6 +204,85 @@ class ShoppingCart(models.Model):
             UniqueConstraint(fields=('user', 'recipe'),
                              name='unique_shopping_cart'),
         )
+        indexes = (
+            models.Index(fields=('created', 'id'),
+                         name='shopping_cart_created_idx'),
+        )
+
+    def __str__(self):
+        return f'Добавил в корзину {self.recipe}'
+
+
+class RecipeRanking(models.Model):
+    '''Модель рейтинга рецептов.
+
+    Строка есть у каждого рецепта, поэтому ленты по рейтингу читаются
+    по индексам оценок без сортировки всех рецептов.
+    '''
+
+    recipe = models.OneToOneField(Recipe,
+                                  verbose_name='Рецепт',
+                                  on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  related_name='ranking')
+    popular_score = models.FloatField(verbose_name='Популярность',
+                                      default=0)
+    trending_score = models.FloatField(verbose_name='Тренд', default=0)
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (
+            models.Index(fields=('-popular_score', '-recipe'),
+                         name='ranking_popular_recipe_idx'),
+            models.Index(fields=('-trending_score', '-recipe'),
+                         name='ranking_trending_recipe_idx'),
+        )
+
+    def __str__(self):
+        return f'Рейтинг {self.recipe}'
+
+
+class RankingCheckpoint(models.Model):
+    '''Последняя учтённая в рейтинге запись источника'''
+
+    source = models.CharField(verbose_name='Источник',
+                              max_length=50,
+                              unique=True)
+    last_created = models.DateTimeField(verbose_name='Время последней записи',
+                                        null=True)
+    last_id = models.BigIntegerField(verbose_name='Последний id', default=0)
+
+    class Meta:
+        verbose_name = 'Отметка пересчёта рейтинга'
+        verbose_name_plural = 'Отметки пересчёта рейтинга'
+
+    def __str__(self):
+        return f'{self.source}: {self.last_id}'
+
+
+class RecipeSearch(models.Model):
+    '''Поисковый документ рецепта.
+
+    vector заполняется только на PostgreSQL, GIN индекс по нему
+    создаётся миграцией.
+    '''
+
+    recipe = models.OneToOneField(Recipe,
+                                  verbose_name='Рецепт',
+                                  on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  related_name='search')
+    name = models.CharField(verbose_name='Название', max_length=200)
+    ingredients = models.TextField(verbose_name='Ингридиенты')
+    text = models.TextField(verbose_name='Текст')
+    vector = SearchVectorField(verbose_name='Поисковый вектор',
+                               null=True,
+                               editable=False)
+
+    class Meta:
+        verbose_name = 'Поисковый документ рецепта'
+        verbose_name_plural = 'Поисковые документы рецептов'
 
     def __str__(self):
-        return f'Добавил в корзину {self.recipe}'
\ No newline at end of file
+        return f'Поиск {self.recipe}'
@@ -0,0 +1,53 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(
+        email='user@example.com', username='user', password='pass12345',
+        first_name='Имя', last_name='Фамилия')
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def recipes(db, user):
+    authors = [
+        User.objects.create_user(
+            email=f'author{i}@example.com', username=f'author{i}',
+            password='pass12345', first_name='Автор', last_name=str(i))
+        for i in range(3)]
+    tags = [Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag{i}') for i in range(2)]
+    ingredients = [Ingredient.objects.create(name=f'Ингредиент {i}',
+                                             measurement_unit='г')
+                   for i in range(3)]
+    recipes = []
+    for i in range(25):
+        recipe = Recipe.objects.create(
+            author=authors[i % len(authors)], name=f'Рецепт {i}',
+            text='Описание', cooking_time=10, image='recipes/test.png')
+        recipe.tags.set(tags)
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe, ingredient=ingredient,
+                              amount=i + 1)
+            for ingredient in ingredients)
+        recipes.append(recipe)
+    return recipes
@@ -0,0 +1,56 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import TOKEN_LOCAL_CACHE_TIMEOUT, token_cache
+
+
+@pytest.mark.django_db
+def test_token_cache_ttl_capped_for_local_cache(user, monkeypatch):
+    token = Token.objects.create(user=user)
+    timeouts = []
+    set_cache = cache.set
+    monkeypatch.setattr(cache, 'set', lambda key, value, timeout: (
+        timeouts.append(timeout), set_cache(key, value, timeout)))
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    assert client.get('/api/users/me/').status_code == 200
+    assert timeouts == [TOKEN_LOCAL_CACHE_TIMEOUT]
+    token_cache.invalidate(token.key)
+
+
+@pytest.fixture
+def token_client(user):
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    assert client.get('/api/users/me/').status_code == 200
+    yield client, token
+    token_cache.invalidate(token.key)
+
+
+def test_token_cache_stores_no_user_data(user, token_client):
+    client, token = token_client
+
+    assert cache.get(token_cache.get_cache_key(token.key)) == (user.pk, True)
+    response = client.get('/api/users/me/')
+    assert response.status_code == 200
+    assert response.json()['email'] == user.email
+
+
+def test_logout_rejects_cached_token(token_client):
+    client, _ = token_client
+
+    assert client.post('/api/auth/token/logout/').status_code == 204
+
+    assert client.get('/api/users/me/').status_code == 401
+
+
+def test_deactivation_rejects_cached_token(user, token_client):
+    client, _ = token_client
+
+    user.is_active = False
+    user.save()
+
+    assert client.get('/api/users/me/').status_code == 401
@@ -0,0 +1,52 @@
+import pytest
+
+from api.autocomplete import (AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT,
+                              database_autocomplete, in_memory_autocomplete)
+from recipes.models import Ingredient
+
+ENGINES = (database_autocomplete, in_memory_autocomplete)
+
+
+@pytest.fixture
+def ingredients(db):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit='г')
+        for name in ('Sea salt', 'Salt', 'Basalt', 'Salsa', 'Pepper'))
+
+
+def search_names(engine, query, limit=AUTOCOMPLETE_LIMIT):
+    return [ingredient.name for ingredient in engine.search(query, limit)]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_prefix_matches_before_substring(ingredients, engine):
+    assert search_names(engine, 'sal') == [
+        'Salsa', 'Salt', 'Basalt', 'Sea salt']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_substring_needs_three_characters(ingredients, engine):
+    assert search_names(engine, 'sa') == ['Salsa', 'Salt']
+    assert search_names(engine, 'al') == []
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_limit_keeps_best_matches(ingredients, engine):
+    assert search_names(engine, 'sal', 3) == ['Salsa', 'Salt', 'Basalt']
+
+
+def test_limit_capped(db, client):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Pepper {i:03d}', measurement_unit='г')
+        for i in range(AUTOCOMPLETE_MAX_LIMIT + 10))
+
+    def count(**params):
+        response = client.get('/api/ingredients/', {'name': 'pep', **params})
+        assert response.status_code == 200
+        return len(response.json())
+
+    assert count() == AUTOCOMPLETE_LIMIT
+    assert count(limit=5) == 5
+    assert count(limit=1000) == AUTOCOMPLETE_MAX_LIMIT
+    assert client.get('/api/ingredients/',
+                      {'name': 'pep', 'limit': 0}).status_code == 400
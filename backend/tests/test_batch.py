@@ -0,0 +1,87 @@
+from unittest import mock
+
+from api import counters
+from api.counters import toggle_relation
+from api.serializers import RECIPE_BATCH_LIMIT
+from recipes.models import Favourite, Recipe, ShoppingCart
+
+BATCH_URL = '/api/recipes/favorite/'
+CLEAR_URL = '/api/recipes/clear_shopping_cart/'
+MISSING_ID = 10 ** 6
+
+
+def favorites_counts(recipes):
+    return list(Recipe.objects.filter(
+        pk__in=[recipe.pk for recipe in recipes]).order_by('pk').values_list(
+        'favorites_count', flat=True))
+
+
+def add_to_cart(user, recipe):
+    toggle_relation(ShoppingCart, True, (Recipe, recipe.pk, 'in_carts_count'),
+                    user=user, recipe=recipe)
+
+
+def test_batch_add_and_remove(recipes, user, user_client):
+    first, second = recipes[:2]
+    user_client.post(f'/api/recipes/{first.pk}/favorite/')
+
+    response = user_client.post(
+        BATCH_URL, {'recipes': [first.pk, second.pk, MISSING_ID, second.pk]},
+        format='json')
+
+    assert response.status_code == 200
+    assert response.json()['applied'] == [second.pk]
+    assert [item['id'] for item in response.json()['skipped']] == [
+        first.pk, MISSING_ID]
+    assert favorites_counts([first, second]) == [1, 1]
+
+    response = user_client.delete(
+        BATCH_URL, {'recipes': [first.pk, second.pk, recipes[2].pk]},
+        format='json')
+
+    assert response.json()['applied'] == [first.pk, second.pk]
+    assert [item['id'] for item in response.json()['skipped']] == [
+        recipes[2].pk]
+    assert favorites_counts(recipes[:3]) == [0, 0, 0]
+    assert not Favourite.objects.filter(user=user).exists()
+
+
+def test_batch_limit(db, user_client):
+    ids = list(range(1, RECIPE_BATCH_LIMIT + 2))
+
+    assert user_client.post(BATCH_URL, {'recipes': ids[:-1]},
+                            format='json').status_code == 200
+    assert user_client.post(BATCH_URL, {'recipes': ids},
+                            format='json').status_code == 400
+
+
+def test_clear_shopping_cart(recipes, user, user_client):
+    other = recipes[0].author
+    for recipe in recipes[:3]:
+        add_to_cart(user, recipe)
+    add_to_cart(other, recipes[0])
+
+    assert user_client.delete(CLEAR_URL).status_code == 204
+
+    assert not ShoppingCart.objects.filter(user=user).exists()
+    assert list(Recipe.objects.filter(pk__in=[
+        recipe.pk for recipe in recipes[:3]]).order_by('pk').values_list(
+        'in_carts_count', flat=True)) == [1, 0, 0]
+
+
+def test_clear_keeps_rows_added_concurrently(recipes, user, user_client):
+    add_to_cart(user, recipes[0])
+    delete_rows = counters.delete_rows
+
+    def delete_after_insert(queryset):
+        add_to_cart(user, recipes[1])
+        return delete_rows(queryset)
+
+    with mock.patch('api.counters.delete_rows', delete_after_insert):
+        assert user_client.delete(CLEAR_URL).status_code == 204
+
+    assert list(ShoppingCart.objects.filter(user=user).values_list(
+        'recipe_id', flat=True)) == [recipes[1].pk]
+    assert list(Recipe.objects.filter(pk__in=[
+        recipes[0].pk, recipes[1].pk]).order_by('pk').values_list(
+        'in_carts_count', flat=True)) == [0, 1]
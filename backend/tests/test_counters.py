@@ -0,0 +1,33 @@
+from api.counters import change_counter
+from recipes.models import Recipe
+from users.models import User
+
+
+def test_stale_save_keeps_counters(recipes, user):
+    stale = Recipe.objects.get(pk=recipes[0].pk)
+    stale_user = User.objects.get(pk=user.pk)
+    change_counter(Recipe, stale.pk, 'favorites_count', 1)
+    change_counter(User, user.pk, 'followers_count', 1)
+
+    stale.name = 'Новое название'
+    stale.save()
+    stale_user.set_password('new-pass12345')
+    stale_user.save()
+
+    recipe = Recipe.objects.get(pk=stale.pk)
+    assert (recipe.name, recipe.favorites_count) == ('Новое название', 1)
+    assert User.objects.get(pk=user.pk).followers_count == 1
+
+
+def test_recipe_patch_keeps_favorites_count(recipes, user, user_client):
+    recipe = recipes[0]
+    recipe.author = user
+    recipe.save()
+    assert user_client.post(
+        f'/api/recipes/{recipe.pk}/favorite/').status_code == 201
+
+    response = user_client.patch(f'/api/recipes/{recipe.pk}/',
+                                 {'name': 'Новое название'}, format='json')
+
+    assert response.status_code == 200
+    assert Recipe.objects.get(pk=recipe.pk).favorites_count == 1
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from api import dumps
+from api.models import ImportCheckpoint
+from recipes.models import Recipe
+from users.models import User
+
+
+def export_and_reimport(path, *flags):
+    call_command('export_recipes', str(path), *flags)
+    passwords = dict(User.objects.filter(
+        username__startswith='author').values_list('email', 'password'))
+    User.objects.filter(username__startswith='author').delete()
+    call_command('import_recipes', str(path), *flags)
+    return passwords, {author.email: author for author in User.objects.filter(
+        username__startswith='author')}
+
+
+def test_export_skips_passwords(recipes, tmp_path):
+    path = tmp_path / 'recipes.ndjson'
+
+    _, authors = export_and_reimport(path)
+
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(rows) == len(recipes)
+    assert all('password' not in row['author'] for row in rows)
+    assert len(authors) == 3
+    assert not any(author.has_usable_password()
+                   for author in authors.values())
+
+
+def test_export_with_passwords(recipes, tmp_path):
+    passwords, authors = export_and_reimport(
+        tmp_path / 'recipes.ndjson', '--with-passwords')
+
+    assert {email: author.password
+            for email, author in authors.items()} == passwords
+    assert all(author.check_password('pass12345')
+               for author in authors.values())
+
+
+def test_import_resumes_without_duplicates(recipes, tmp_path, monkeypatch):
+    path = tmp_path / 'recipes.ndjson'
+    call_command('export_recipes', str(path))
+    names = sorted(Recipe.objects.values_list('name', flat=True))
+    Recipe.objects.all().delete()
+    save_import_offset = dumps.save_import_offset
+
+    def fail_second_batch(checkpoint, offset):
+        if ImportCheckpoint.objects.exists():
+            raise ValueError('Сбой.')
+        save_import_offset(checkpoint, offset)
+
+    monkeypatch.setattr(dumps, 'save_import_offset', fail_second_batch)
+    with pytest.raises(CommandError):
+        call_command('import_recipes', str(path), '--batch-size', '10')
+    assert Recipe.objects.count() == 10
+
+    monkeypatch.setattr(dumps, 'save_import_offset', save_import_offset)
+    call_command('import_recipes', str(path), '--batch-size', '10')
+
+    assert sorted(Recipe.objects.values_list('name', flat=True)) == names
+    assert ImportCheckpoint.objects.get().offset == path.stat().st_size
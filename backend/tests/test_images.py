@@ -0,0 +1,49 @@
+import base64
+from io import BytesIO
+from unittest import mock
+
+import pytest
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.fields import Base64ImageField
+from api.images import run_generate_thumbnails
+
+
+def encode(content):
+    return 'data:image/png;base64,' + base64.b64encode(content).decode()
+
+
+def make_png(size=(4, 4)):
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_valid_image():
+    file = Base64ImageField().to_internal_value(encode(make_png()))
+    assert file.name.endswith('.png')
+    file.close()
+
+
+def test_truncated_image():
+    with pytest.raises(ValidationError):
+        Base64ImageField().to_internal_value(encode(make_png()[:-20]))
+
+
+def test_too_many_pixels(monkeypatch):
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 10)
+    with pytest.raises(ValidationError):
+        Base64ImageField().to_internal_value(encode(make_png()))
+
+
+def test_decompression_bomb(monkeypatch):
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 4)
+    with pytest.raises(ValidationError):
+        Base64ImageField().to_internal_value(encode(make_png()))
+
+
+def test_thumbnail_job_closes_connections():
+    with mock.patch('api.images.close_old_connections') as close:
+        run_generate_thumbnails('recipes/missing.png')
+    assert close.call_count == 2
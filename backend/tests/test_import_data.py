@@ -0,0 +1,30 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from recipes.models import Ingredient
+
+
+@pytest.mark.django_db
+def test_import_csv(tmp_path):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('соль,г\n\nсахар,г\n', encoding='utf-8')
+    call_command('import_data', '--path', str(path))
+    assert Ingredient.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_import_csv_short_row(tmp_path):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('соль,г\nсахар\n', encoding='utf-8')
+    with pytest.raises(CommandError, match='Строка 2'):
+        call_command('import_data', '--path', str(path))
+
+
+@pytest.mark.django_db
+def test_import_json_missing_key(tmp_path):
+    path = tmp_path / 'ingredients.json'
+    path.write_text('[{"name": "соль", "measurement_unit": "г"}, '
+                    '{"name": "сахар"}]', encoding='utf-8')
+    with pytest.raises(CommandError, match='Объект 2'):
+        call_command('import_data', '--path', str(path))
@@ -0,0 +1,48 @@
+import logging
+
+from rest_framework.test import APIClient
+
+from users.models import User
+
+
+def test_server_timing_disabled_by_default(recipes, client):
+    response = client.get('/api/recipes/')
+
+    assert response.status_code == 200
+    assert 'Server-Timing' not in response
+
+
+def test_server_timing_header(recipes, client, settings):
+    settings.SERVER_TIMING = True
+
+    response = client.get('/api/recipes/')
+
+    assert response.status_code == 200
+    assert response['Server-Timing'].startswith('db;dur=')
+    assert 'queries"' in response['Server-Timing']
+
+
+def test_queries_over_budget_logged(recipes, client, settings, caplog):
+    settings.QUERY_BUDGET = 0
+
+    with caplog.at_level(logging.WARNING, logger='api.metrics'):
+        client.get('/api/recipes/')
+
+    assert 'RecipeViewSet.list' in caplog.text
+    assert 'при бюджете 0' in caplog.text
+
+
+def test_metrics_for_admins_only(recipes, client, user_client):
+    admin = User.objects.create_superuser(
+        email='admin@example.com', username='admin', password='pass12345',
+        first_name='Админ', last_name='Админ')
+    admin_client = APIClient()
+    admin_client.force_authenticate(admin)
+    client.get('/api/recipes/')
+
+    assert client.get('/api/metrics/').status_code == 401
+    assert user_client.get('/api/metrics/').status_code == 403
+    response = admin_client.get('/api/metrics/')
+    assert response.status_code == 200
+    assert ('foodgram_request_duration_seconds_count'
+            '{view="RecipeViewSet.list"}') in response.content.decode()
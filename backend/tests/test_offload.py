@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import pytest
+from django.http import StreamingHttpResponse
+
+from api.offload import STREAM_BUFFER_PARTS, OffloadASGIHandler
+from recipes.models import Tag
+
+
+def send_offloaded(response):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    response.offloaded = True
+    asyncio.run(OffloadASGIHandler().send_response(response, send))
+    return messages
+
+
+def test_streaming_content_read_in_pool(db):
+    threads = []
+
+    def stream():
+        for number in range(STREAM_BUFFER_PARTS * 4):
+            threads.append(threading.current_thread().name)
+            yield f'{number},{Tag.objects.count()}\n'
+
+    messages = send_offloaded(StreamingHttpResponse(
+        stream(), content_type='text/csv'))
+
+    assert messages[0]['status'] == 200
+    assert (b'Content-Type', b'text/csv') in messages[0]['headers']
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    assert body.decode().splitlines() == [
+        f'{number},0' for number in range(STREAM_BUFFER_PARTS * 4)]
+    assert messages[-1] == {'type': 'http.response.body'}
+    assert all(name.startswith('views') for name in threads)
+
+
+def test_pool_stops_reading_after_disconnect(db):
+    produced = []
+
+    def stream():
+        for number in range(STREAM_BUFFER_PARTS * 100):
+            produced.append(number)
+            yield b'x'
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            raise OSError('disconnected')
+
+    response = StreamingHttpResponse(stream())
+    response.offloaded = True
+    try:
+        asyncio.run(OffloadASGIHandler().send_response(response, send))
+    except OSError:
+        pass
+
+    assert len(produced) <= STREAM_BUFFER_PARTS + 2
+
+
+def test_stream_error_reaches_handler(db):
+    def stream():
+        yield b'first'
+        raise ValueError('broken')
+
+    with pytest.raises(ValueError):
+        send_offloaded(StreamingHttpResponse(stream()))
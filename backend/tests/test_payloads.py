@@ -0,0 +1,62 @@
+from io import BytesIO
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from api.images import get_thumbnail_name, run_generate_thumbnails
+from api.payloads import (RECIPE_PAYLOAD_PENDING_TIMEOUT,
+                          RECIPE_PAYLOAD_TIMEOUT, get_recipe_payloads)
+from recipes.models import Recipe
+
+
+def cached_timeouts(pks):
+    with mock.patch.object(cache, 'set_many',
+                           wraps=cache.set_many) as set_many:
+        get_recipe_payloads(pks, 'card')
+    return {pk: timeout for call in set_many.call_args_list
+            for (payloads, timeout) in [call.args]
+            for pk in (payload['id'] for payload in payloads.values())}
+
+
+def test_payload_without_thumbnail_cached_briefly(recipes):
+    recipe = recipes[0]
+
+    assert cached_timeouts([recipe.pk]) == {
+        recipe.pk: RECIPE_PAYLOAD_PENDING_TIMEOUT}
+
+
+@pytest.fixture
+def thumbnail(recipes):
+    name = default_storage.save(
+        get_thumbnail_name(recipes[0].image.name, 'card'),
+        ContentFile(b'thumbnail'))
+    yield name
+    default_storage.delete(name)
+
+
+def test_payload_with_thumbnail_cached_long(recipes, thumbnail):
+    recipe = recipes[0]
+
+    assert cached_timeouts([recipe.pk]) == {
+        recipe.pk: RECIPE_PAYLOAD_TIMEOUT}
+
+
+def test_generated_thumbnail_replaces_original(recipes):
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8)).save(buffer, 'PNG')
+    name = default_storage.save('recipes/signal.png',
+                                ContentFile(buffer.getvalue()))
+    Recipe.objects.filter(pk=recipes[0].pk).update(image=name)
+    pending = get_recipe_payloads([recipes[0].pk], 'card')[recipes[0].pk]
+
+    with mock.patch('api.images.close_old_connections'):
+        run_generate_thumbnails(name)
+
+    payload = get_recipe_payloads([recipes[0].pk], 'card')[recipes[0].pk]
+    assert payload['image'] != pending['image']
+    assert payload['image'] == default_storage.url(
+        get_thumbnail_name(name, 'card'))
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import pytest
+
+from api.counters import change_counter
+from api.rankings import refresh_rankings
+from recipes.models import Favourite, Recipe, RecipeRanking, ShoppingCart
+
+FAR_FUTURE = datetime(2100, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def settled():
+    with mock.patch('api.rankings.get_settled_time',
+                    return_value=FAR_FUTURE + timedelta(days=1)) as patched:
+        yield patched
+
+
+def add_events(model, recipe, users, created):
+    model.objects.bulk_create(model(user=user, recipe=recipe)
+                              for user in users)
+    model.objects.filter(recipe=recipe).update(created=created)
+
+
+def test_trending_far_from_epoch(recipes, user, settled):
+    users = [recipe.author for recipe in recipes[:3]] + [user]
+    add_events(Favourite, recipes[0], users[:1], FAR_FUTURE)
+    add_events(ShoppingCart, recipes[1], users, FAR_FUTURE)
+    add_events(Favourite, recipes[2], users,
+               FAR_FUTURE - timedelta(days=30))
+
+    assert refresh_rankings() == (3, 0)
+
+    ordered = list(RecipeRanking.objects.order_by(
+        '-trending_score').values_list('recipe_id', flat=True)[:3])
+    assert ordered == [recipes[1].pk, recipes[0].pk, recipes[2].pk]
+
+
+def test_incremental_refresh_matches_full(recipes, user, settled):
+    add_events(Favourite, recipes[0], [user], FAR_FUTURE)
+    refresh_rankings()
+    add_events(ShoppingCart, recipes[0], [user], FAR_FUTURE)
+    refresh_rankings()
+    incremental = RecipeRanking.objects.get(pk=recipes[0].pk).trending_score
+
+    refresh_rankings(full=True)
+
+    full = RecipeRanking.objects.get(pk=recipes[0].pk).trending_score
+    assert abs(incremental - full) < 1e-9
+
+
+def test_late_commit_counted(recipes, user):
+    now = datetime.now(timezone.utc)
+    late = Favourite.objects.create(user=user, recipe=recipes[1])
+    Favourite.objects.filter(pk=late.pk).update(
+        created=now - timedelta(minutes=4))
+    add_events(Favourite, recipes[0], [user], now - timedelta(minutes=10))
+
+    assert refresh_rankings()[0] == 1
+
+    with mock.patch('api.rankings.get_settled_time', return_value=now):
+        assert refresh_rankings()[0] == 1
+    assert RecipeRanking.objects.get(pk=recipes[1].pk).trending_score > 0
+
+
+def test_recent_events_wait_for_settle_time(recipes, user):
+    Favourite.objects.create(user=user, recipe=recipes[0])
+
+    assert refresh_rankings()[0] == 0
+
+
+def test_every_recipe_has_ranking(recipes):
+    assert RecipeRanking.objects.count() == len(recipes)
+
+
+def test_ranked_feed_order(recipes, user, client):
+    change_counter(Recipe, recipes[3].pk, 'favorites_count', 2)
+    change_counter(Recipe, recipes[7].pk, 'favorites_count', 1)
+    refresh_rankings()
+
+    response = client.get('/api/recipes/?ordering=popular&limit=3')
+
+    assert [recipe['id'] for recipe in response.json()['results']] == [
+        recipes[3].pk, recipes[7].pk, recipes[-1].pk]
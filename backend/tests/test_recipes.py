@@ -0,0 +1,34 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Favourite, ShoppingCart
+from users.models import Follow
+
+
+def count_queries(client, url):
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.json()['results']) == int(url.rsplit('=', 1)[1])
+    return len(context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_recipe_list_queries_anonymous(recipes):
+    client = APIClient()
+    assert (count_queries(client, '/api/recipes/?limit=2')
+            == count_queries(client, '/api/recipes/?limit=20'))
+
+
+@pytest.mark.django_db
+def test_recipe_list_queries_authenticated(recipes, user, user_client):
+    for recipe in recipes[::2]:
+        Favourite.objects.create(user=user, recipe=recipe)
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+    Follow.objects.create(user=user, author=recipes[0].author)
+    assert (count_queries(user_client, '/api/recipes/?limit=2')
+            == count_queries(user_client, '/api/recipes/?limit=20'))
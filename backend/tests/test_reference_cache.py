@@ -0,0 +1,18 @@
+from api.caches import ingredient_cache, tag_cache
+from recipes.models import Ingredient, Tag
+
+
+def test_reference_caches_invalidated_on_commit(
+        db, django_capture_on_commit_callbacks):
+    versions = tag_cache.get_version(), ingredient_cache.get_version()
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        Tag.objects.create(name='Завтрак', color='#ff0000', slug='breakfast')
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        assert (tag_cache.get_version(),
+                ingredient_cache.get_version()) == versions
+
+    for callback in callbacks:
+        callback()
+    assert tag_cache.get_version() != versions[0]
+    assert ingredient_cache.get_version() != versions[1]
@@ -0,0 +1,83 @@
+import pytest
+
+from api import search
+from recipes.models import Ingredient, Recipe
+
+
+@pytest.fixture
+def indexed(recipes):
+    search.update_search([recipe.pk for recipe in recipes])
+    search.recipe_search_cache.invalidate()
+    return recipes
+
+
+def search_ids(client, query, **params):
+    response = client.get('/api/recipes/',
+                          {'search': query, 'limit': 50, **params})
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def test_name_match_ranks_above_text_match(indexed, user_client):
+    by_text, by_name = indexed[0], indexed[1]
+    Recipe.objects.filter(pk=by_text.pk).update(text='Щавелевый суп')
+    Recipe.objects.filter(pk=by_name.pk).update(name='Щавелевый суп')
+    search.update_search([by_text.pk, by_name.pk])
+    search.recipe_search_cache.invalidate()
+
+    assert search_ids(user_client, 'щавел') == [by_name.pk, by_text.pk]
+
+
+def test_search_combines_with_author_and_tags(indexed, user_client):
+    untagged = indexed[1]
+    untagged.tags.clear()
+    expected = sorted((recipe.pk for recipe in indexed
+                       if recipe.author == untagged.author
+                       and recipe != untagged), reverse=True)
+
+    assert search_ids(user_client, 'рецепт', author=untagged.author.pk,
+                      tags='tag0') == expected
+
+
+def test_result_cap_applies_after_filters(indexed, user_client,
+                                          monkeypatch):
+    monkeypatch.setattr(search, 'SEARCH_MAX_RESULTS', 2)
+    author = indexed[0].author
+    expected = sorted((recipe.pk for recipe in indexed
+                       if recipe.author == author), reverse=True)
+
+    assert search_ids(user_client, 'рецепт',
+                      author=author.pk) == expected[:2]
+
+
+def test_recipe_edit_reindexes(indexed, user, user_client,
+                               django_capture_on_commit_callbacks):
+    recipe = indexed[0]
+    recipe.author = user
+    recipe.save()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.patch(f'/api/recipes/{recipe.pk}/',
+                                     {'name': 'Щавелевый суп'},
+                                     format='json')
+
+    assert response.status_code == 200
+    assert search_ids(user_client, 'щавел') == [recipe.pk]
+    assert recipe.pk not in search_ids(user_client, 'рецепт')
+
+
+def test_recipe_ingredients_edit_reindexes(
+        indexed, user, user_client, django_capture_on_commit_callbacks):
+    recipe = indexed[0]
+    recipe.author = user
+    recipe.save()
+    sorrel = Ingredient.objects.create(name='Щавель', measurement_unit='г')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.patch(
+            f'/api/recipes/{recipe.pk}/',
+            {'ingredients': [{'id': sorrel.pk, 'amount': 100}]},
+            format='json')
+
+    assert response.status_code == 200
+    assert search_ids(user_client, 'щавел') == [recipe.pk]
@@ -0,0 +1,50 @@
+import pytest
+
+from recipes.models import RecipeIngredients, ShoppingCart
+
+CART_URL = '/api/recipes/download_shopping_cart/?output=txt'
+
+
+def get_etag(client):
+    response = client.get(CART_URL)
+    assert response.status_code == 200
+    return response['ETag']
+
+
+@pytest.fixture
+def cart(recipes, user):
+    ShoppingCart.objects.create(user=user, recipe=recipes[0])
+    return recipes[0]
+
+
+@pytest.mark.django_db
+def test_cart_not_modified(cart, user_client):
+    etag = get_etag(user_client)
+    assert user_client.get(
+        CART_URL, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+@pytest.mark.django_db
+def test_cart_changes_on_ingredient_rename(
+        cart, user_client, django_capture_on_commit_callbacks):
+    etag = get_etag(user_client)
+    ingredient = cart.ingredients.first()
+    ingredient.name = 'Новое название'
+    with django_capture_on_commit_callbacks(execute=True):
+        ingredient.save()
+    response = user_client.get(CART_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert 'Новое название' in b''.join(
+        response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+def test_cart_changes_on_recipe_ingredient_edit(
+        cart, user_client, django_capture_on_commit_callbacks):
+    etag = get_etag(user_client)
+    row = RecipeIngredients.objects.filter(recipe=cart).first()
+    row.amount = 999
+    with django_capture_on_commit_callbacks(execute=True):
+        row.save()
+    assert user_client.get(
+        CART_URL, HTTP_IF_NONE_MATCH=etag).status_code == 200
@@ -0,0 +1,70 @@
+import pytest
+
+from recipes.models import Recipe
+from users.models import User
+
+CART_URL = '/api/recipes/download_shopping_cart/?output=txt'
+
+
+def recipe_counter(recipe, field):
+    return getattr(Recipe.objects.get(pk=recipe.pk), field)
+
+
+@pytest.mark.parametrize('action, field', [
+    ('favorite', 'favorites_count'),
+    ('shopping_cart', 'in_carts_count'),
+])
+def test_recipe_toggle(recipes, user_client, action, field):
+    recipe = recipes[0]
+    url = f'/api/recipes/{recipe.pk}/{action}/'
+
+    assert user_client.post(url).status_code == 201
+    assert recipe_counter(recipe, field) == 1
+    assert user_client.post(url).status_code == 400
+    assert recipe_counter(recipe, field) == 1
+
+    assert user_client.delete(url).status_code == 204
+    assert recipe_counter(recipe, field) == 0
+    assert user_client.delete(url).status_code == 400
+    assert recipe_counter(recipe, field) == 0
+
+
+@pytest.mark.parametrize('action', ['favorite', 'shopping_cart'])
+@pytest.mark.parametrize('method', ['post', 'delete'])
+def test_recipe_toggle_missing_recipe(db, user_client, action, method):
+    response = getattr(user_client, method)(f'/api/recipes/0/{action}/')
+    assert response.status_code == 404
+
+
+def test_subscribe_toggle(recipes, user_client):
+    author = recipes[0].author
+    url = f'/api/users/{author.pk}/subscribe/'
+
+    assert user_client.post(url).status_code == 201
+    assert User.objects.get(pk=author.pk).followers_count == 1
+    assert user_client.post(url).status_code == 400
+
+    assert user_client.delete(url).status_code == 204
+    assert User.objects.get(pk=author.pk).followers_count == 0
+    assert user_client.delete(url).status_code == 400
+    assert User.objects.get(pk=author.pk).followers_count == 0
+    assert user_client.delete('/api/users/0/subscribe/').status_code == 404
+
+
+def test_cart_toggle_changes_etag(
+        recipes, user_client, django_capture_on_commit_callbacks):
+    etag = user_client.get(CART_URL)['ETag']
+    url = f'/api/recipes/{recipes[0].pk}/shopping_cart/'
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert user_client.post(url).status_code == 201
+    response = user_client.get(CART_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert recipes[0].ingredients.first().name in b''.join(
+        response.streaming_content).decode()
+
+    etag = response['ETag']
+    with django_capture_on_commit_callbacks(execute=True):
+        assert user_client.delete(url).status_code == 204
+    assert user_client.get(
+        CART_URL, HTTP_IF_NONE_MATCH=etag).status_code == 200
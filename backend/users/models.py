@@ -4,15 +4,40 @@ from django.db import models
 from django.db.models import UniqueConstraint
 
 
-class User(AbstractUser):
+class CountersMixin:
+    '''Модель со счётчиками, которые меняются только атомарным UPDATE.
+
+    Сохранение существующей строки не записывает счётчики, иначе
+    устаревшее значение в памяти затёрло бы изменения через F().
+    '''
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields]
+        super().save(*args, **kwargs)
+
+
+class User(CountersMixin, AbstractUser):
     '''Модель пользователя.'''
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
+    counter_fields = ('recipes_count', 'followers_count')
 
     email = models.EmailField(verbose_name='Почта',
                               max_length=254,
                               unique=True)
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов', default=0, editable=False)
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков', default=0, editable=False)
 
     class Meta:
         verbose_name = 'Пользователь'